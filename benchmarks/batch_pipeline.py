@@ -0,0 +1,47 @@
+"""Time a batch of renames run serially and through the stage pipeline.
+
+    python benchmarks/batch_pipeline.py [files] [download_s] [remux_s] [upload_s]
+
+Stages are simulated with sleeps (defaults roughly match a 24-episode season
+on a fast link, scaled down), so this measures the overlap the pipeline buys,
+not Telegram or ffmpeg. The ideal speed-up approaches the number of stages.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper.pipeline import run_pipeline
+
+
+def stage(seconds):
+    async def run(item):
+        await asyncio.sleep(seconds)
+    return run
+
+
+async def main(files, durations):
+    stages = [stage(s) for s in durations]
+
+    start = time.perf_counter()
+    for item in range(files):
+        for run in stages:
+            await run(item)
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await run_pipeline(list(range(files)), stages)
+    pipelined = time.perf_counter() - start
+
+    print(f"{files} files, stages {durations} s")
+    print(f"serial:    {serial:6.2f} s")
+    print(f"pipelined: {pipelined:6.2f} s  ({serial / pipelined:.2f}x, {len(stages)} stages)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    files = int(args[0]) if args else 24
+    durations = [float(a) for a in args[1:4]] or [0.10, 0.08, 0.10]
+    asyncio.run(main(files, durations))
@@ -0,0 +1,93 @@
+"""Time the filename parser.
+
+    python benchmarks/filename_parser.py [rounds]
+
+Compares the previous multi-pass regex implementation with the single-pass
+tokenizer (cold, and through the memoized entry point) on a synthetic corpus
+of release names. Each figure is the best of ``rounds`` runs, so a busy
+machine doesn't skew the comparison. Correctness is covered by
+tests/test_filename_parser.py.
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helper.filename_parser import _parse, extract_file_info_batch
+
+TITLES = ["Naruto Shippuden", "One Piece", "Jujutsu Kaisen", "Attack on Titan", "Demon Slayer", "Spy x Family"]
+TEMPLATES = [
+    "{t} S{s:02d}E{e:02d} {r} {a}.mkv",
+    "{t}.S{s:02d}E{e:02d}.{r}.x265-GRP.mkv",
+    "[SubsPlease] {t} - {e:02d} ({r}) [ABCD1234].mkv",
+    "{t} {s}x{e:02d} [{r}] HEVC.mp4",
+    "{t} E{e:03d} [{a}].mkv",
+]
+
+
+LEGACY_PATTERNS = {
+    'season_ep': re.compile(r'S(\d+)[._\s]?(?:E|EP)(\d+)', re.IGNORECASE),
+    'resolution': re.compile(r'(?:2160|1080|720|480)p|4k', re.IGNORECASE),
+    'audio': re.compile(r'\b(?:DUB|SUB|DUAL(?:\s*AUDIO)?)\b', re.IGNORECASE),
+}
+
+
+def legacy_extract_file_info(filename):
+    patterns = LEGACY_PATTERNS
+    info = {'title': '', 'season': '1', 'episode': '1', 'resolution': '', 'audio': ''}
+    filename = os.path.splitext(filename)[0]
+    m = patterns['season_ep'].search(filename)
+    if m:
+        info['season'], info['episode'] = m.group(1), m.group(2)
+        filename = patterns['season_ep'].sub('', filename)
+    m = patterns['resolution'].search(filename)
+    if m:
+        info['resolution'] = m.group(0).upper()
+        filename = patterns['resolution'].sub('', filename)
+    m = patterns['audio'].search(filename)
+    if m:
+        info['audio'] = m.group(0).lower()
+        filename = patterns['audio'].sub('', filename)
+    info['title'] = re.sub(r'\s+', ' ', re.sub(r'[._]', ' ', filename)).strip()
+    return info
+
+
+def make_names(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(
+            t=rng.choice(TITLES), s=rng.randint(1, 5), e=rng.randint(1, 120),
+            r=rng.choice(["480p", "720p", "1080p", "2160p"]), a=rng.choice(["SUB", "DUB", "DUAL"]),
+        )
+        for _ in range(count)
+    ]
+
+
+def bench(label, func, names, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(names)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<22} {best / len(names) * 1e6:8.2f} us/name")
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    names = make_names(2000)
+
+    def cold(batch):
+        _parse.cache_clear()
+        extract_file_info_batch(batch)
+
+    bench("legacy multi-pass", lambda batch: [legacy_extract_file_info(n) for n in batch], names, rounds)
+    bench("single-pass (cold)", cold, names, rounds)
+    extract_file_info_batch(names)
+    bench("single-pass (memoized)", extract_file_info_batch, names, rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Compare the old and new MongoDB access patterns against a real mongod.
+
+    python benchmarks/mongo.py [--url mongodb://localhost:27017] [--users 5000]
+
+Uses a scratch database (dropped afterwards) and counts wire round trips with a
+pymongo command listener, so the numbers show both latency and chattiness:
+
+- add_user: find_one + insert_one  vs  one update_one upsert with $setOnInsert
+- user count: count_documents({})  vs  estimated_document_count()
+- broadcast scan: whole documents  vs  _id projection with a large batch size
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import motor.motor_asyncio
+from pymongo import monitoring
+
+
+class RoundTrips(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def new_user(user_id):
+    return dict(
+        _id=user_id,
+        file_id=None,
+        caption=None,
+        metadata=True,
+        metadata_code="Telegram : @AshutoshGoswami24",
+        format_template=None,
+    )
+
+
+async def old_add_user(col, user_id):
+    if not await col.find_one({"_id": user_id}):
+        await col.insert_one(new_user(user_id))
+
+
+async def new_add_user(col, user_id):
+    user = new_user(user_id)
+    del user["_id"]
+    await col.update_one({"_id": user_id}, {"$setOnInsert": user}, upsert=True)
+
+
+async def measure(listener, label, runs, func):
+    listener.count = 0
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        await func(i)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(
+        f"  {label:<34} {statistics.mean(timings) * 1000:8.3f} ms avg"
+        f"  {timings[int(len(timings) * 0.95)] * 1000:8.3f} ms p95"
+        f"  {listener.count / runs:6.2f} round trips"
+    )
+
+
+async def main(url, users):
+    listener = RoundTrips()
+    client = motor.motor_asyncio.AsyncIOMotorClient(url, event_listeners=[listener], compressors="zlib")
+    db = client["autorename_benchmark"]
+    try:
+        await client.drop_database(db.name)
+        old, new = db.old_users, db.new_users
+
+        print(f"add_user, {users} new users then the same users again (/start repeated)")
+        await measure(listener, "find_one + insert_one (new)", users, lambda i: old_add_user(old, i))
+        await measure(listener, "upsert $setOnInsert (new)", users, lambda i: new_add_user(new, i))
+        await measure(listener, "find_one + insert_one (existing)", users, lambda i: old_add_user(old, i))
+        await measure(listener, "upsert $setOnInsert (existing)", users, lambda i: new_add_user(new, i))
+
+        print("\nuser count")
+        await measure(listener, "count_documents({})", 50, lambda i: new.count_documents({}))
+        await measure(listener, "estimated_document_count()", 50, lambda i: new.estimated_document_count())
+
+        print("\nbroadcast scan of every user")
+
+        async def scan(projection, batch_size):
+            return [doc["_id"] async for doc in new.find({}, projection=projection, batch_size=batch_size)]
+
+        await measure(listener, "whole documents, default batches", 5, lambda i: scan(None, 0))
+        await measure(listener, "_id projection, batch_size=1000", 5, lambda i: scan({"_id": 1}, 1000))
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="mongodb://localhost:27017")
+    parser.add_argument("--users", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.users))
@@ -0,0 +1,142 @@
+"""Compare a sequential download with ParallelDownloader against a local stand-in server.
+
+    python benchmarks/parallel_download.py [--size-mb 256] [--rtt-ms 80] [--chunk-mbps 40]
+
+A local aiohttp server plays Telegram: every 1 MiB GetFile request waits one
+round trip and is then served at a capped per-request rate, which is how a
+far-away DC behaves. A session is one HTTP connection that carries one
+request at a time. The sequential run goes through the stand-in client's
+``get_file``, which has pyrogram's signature and asks for one chunk at a time
+over the client's single shared session, exactly like ``download_media``.
+The parallel run opens one dedicated session per worker, like the
+downloader does. Both files are checked against the source before the
+timings are printed.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+from aiohttp import ClientSession, TCPConnector, web
+from pyrogram import raw
+from pyrogram.file_id import FileId, FileType
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# config.py parses these as ints at import time
+os.environ.setdefault("LOG_CHANNEL", "0")
+os.environ.setdefault("PORT", "8080")
+
+from helper.downloader import CHUNK_SIZE, ParallelDownloader
+
+
+def make_server(data, rtt, chunk_rate):
+    async def get_file(request):
+        offset = int(request.query["offset"])
+        chunk = data[offset:offset + CHUNK_SIZE]
+        await asyncio.sleep(rtt + len(chunk) / chunk_rate)
+        return web.Response(body=chunk)
+
+    app = web.Application()
+    app.router.add_get("/file", get_file)
+    return app
+
+
+class StandInSession:
+    """Just enough of pyrogram's Session for the downloader's GetFile calls."""
+
+    def __init__(self, url):
+        self.url = url
+        # One connection, one request at a time
+        self.http = ClientSession(connector=TCPConnector(limit=1))
+
+    async def invoke(self, query, sleep_threshold=None):
+        async with self.http.get(self.url, params={"offset": query.offset}) as response:
+            chunk = await response.read()
+        return raw.types.upload.File(type=raw.types.storage.FilePartial(), mtime=0, bytes=chunk)
+
+    async def stop(self):
+        await self.http.close()
+
+
+class StandInClient:
+    """Just enough of pyrogram.Client for the downloader: the shared session's ``get_file``."""
+
+    def __init__(self, url):
+        self.session = StandInSession(url)
+
+    async def get_file(self, file_id, file_size=0, limit=0, offset=0):
+        total = limit or (1 << 31) - 1
+        for chunk_index in range(offset, offset + total):
+            query = raw.functions.upload.GetFile(location=None, offset=chunk_index * CHUNK_SIZE, limit=CHUNK_SIZE)
+            r = await self.session.invoke(query)
+            yield r.bytes
+            if len(r.bytes) < CHUNK_SIZE:
+                break
+
+
+class StandInDownloader(ParallelDownloader):
+    def __init__(self, url, *args):
+        super().__init__(*args)
+        self.url = url
+
+    async def open_session(self, client, dc_id):
+        return StandInSession(self.url)
+
+
+async def sequential(client, size, path):
+    with open(path, "wb") as f:
+        async for chunk in client.get_file(None, size):
+            f.write(chunk)
+
+
+async def main(size_mb, rtt_ms, chunk_mbps, parts):
+    data = os.urandom(size_mb * CHUNK_SIZE + 12345)
+    digest = hashlib.sha256(data).hexdigest()
+    runner = web.AppRunner(make_server(data, rtt_ms / 1000, chunk_mbps * 1024 * 1024 / 8))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/file"
+    downloader = StandInDownloader(url, parts, 16 * CHUNK_SIZE, 8)
+    file_id = FileId(file_type=FileType.DOCUMENT, dc_id=2, media_id=1, access_hash=0)
+    print(f"{len(data) / CHUNK_SIZE:.0f} MiB, {rtt_ms} ms round trip, {chunk_mbps} Mbit/s per request")
+    client = StandInClient(url)
+    try:
+        runs = {
+            "sequential": lambda path: sequential(client, len(data), path),
+            f"parallel ({downloader.parts_for(len(data))} sessions)": lambda path: downloader.download_file(
+                client, file_id, len(data), path
+            ),
+        }
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, run in runs.items():
+                path = os.path.join(tmp, label.split()[0])
+                start = time.perf_counter()
+                await run(path)
+                results[label] = time.perf_counter() - start
+                with open(path, "rb") as f:
+                    assert hashlib.sha256(f.read()).hexdigest() == digest, f"{label} download is corrupt"
+    finally:
+        await client.session.stop()
+        await downloader.stop()
+        await runner.cleanup()
+
+    base = results["sequential"]
+    for label, seconds in results.items():
+        mbps = len(data) * 8 / seconds / 1024 / 1024
+        print(f"  {label:<20} {seconds:7.2f} s  {mbps:8.1f} Mbit/s  {base / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--rtt-ms", type=float, default=80)
+    parser.add_argument("--chunk-mbps", type=float, default=40)
+    parser.add_argument("--parts", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.size_mb, args.rtt_ms, args.chunk_mbps, args.parts))
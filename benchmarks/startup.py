@@ -0,0 +1,105 @@
+"""Measure bot start-up: module import time and time until the bot is ready.
+
+    python benchmarks/startup.py [--runs N]      # import time, no network needed
+    python benchmarks/startup.py --ready         # start bot.py for real (needs its env)
+
+The import check runs ``python -X importtime`` in fresh interpreters, importing
+bot.py and every plugin the way pyrogram loads them, and prints the slowest
+top-level packages. ``--ready`` launches bot.py with the current environment and
+reports the wall time until it logs "ready in", then stops it.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only what config.py needs to import; nothing here connects anywhere
+DUMMY_ENV = {
+    "API_ID": "1",
+    "API_HASH": "0" * 32,
+    "BOT_TOKEN": "1:dummy",
+    "DB_URL": "mongodb://127.0.0.1:1",
+    "LOG_CHANNEL": "0",
+    "PORT": "8080",
+}
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def plugin_modules():
+    return [
+        f"plugins.{name[:-3]}"
+        for name in sorted(os.listdir(os.path.join(ROOT, "plugins")))
+        if name.endswith(".py") and not name.startswith("_")
+    ]
+
+
+def import_profile():
+    code = "import importlib, bot\n" + "".join(
+        f"importlib.import_module({module!r})\n" for module in plugin_modules()
+    )
+    env = dict(os.environ, **{k: os.environ.get(k, v) for k, v in DUMMY_ENV.items()})
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(result.stderr[-2000:])
+    # Top-level imports only (one space of indent); cumulative microseconds
+    top = {}
+    for match in IMPORT_LINE.finditer(result.stderr):
+        if len(match.group(3)) == 1:
+            top[match.group(4)] = int(match.group(2))
+    return wall, top
+
+
+def run_imports(runs):
+    walls, tops = [], []
+    for _ in range(runs):
+        wall, top = import_profile()
+        walls.append(wall)
+        tops.append(top)
+    print(f"interpreter + imports: {statistics.median(walls) * 1000:.0f} ms (median of {runs})")
+    print()
+    print("slowest top-level imports (median cumulative ms):")
+    names = set().union(*tops)
+    medians = {name: statistics.median(t.get(name, 0) for t in tops) / 1000 for name in names}
+    for name, ms in sorted(medians.items(), key=lambda item: -item[1])[:15]:
+        print(f"  {ms:8.1f}  {name}")
+
+
+def run_ready(timeout):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "bot.py"], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+    try:
+        for line in process.stdout:
+            if "ready in" in line:
+                print(f"time to ready: {time.perf_counter() - start:.2f} s (wall, including interpreter)")
+                print(line.strip())
+                return
+            if time.perf_counter() - start > timeout:
+                break
+        sys.exit("bot.py exited or timed out before it was ready")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ready", action="store_true")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+    if args.ready:
+        run_ready(args.timeout)
+    else:
+        run_imports(args.runs)
@@ -0,0 +1,75 @@
+"""Measure event-loop lag while thumbnails are rendered inline vs. on the thumbnail pool.
+
+    python benchmarks/thumbnail_loop_lag.py [count]
+
+A ticker coroutine sleeps 5 ms in a loop and records how late each wake-up
+is. Inline rendering blocks the loop for the whole PIL decode/resize/encode,
+which is what every other user's progress edits and uploads feel.
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_CHANNEL", "0")
+os.environ.setdefault("PORT", "8080")
+
+from PIL import Image
+
+from helper.thumbnail import process_thumbnail, render_thumbnail
+
+
+async def ticker(stop, lags, interval=0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run(paths, offload):
+    stop, lags = asyncio.Event(), []
+    tick = asyncio.create_task(ticker(stop, lags))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    if offload:
+        await asyncio.gather(*(process_thumbnail(p) for p in paths))
+    else:
+        for p in paths:
+            render_thumbnail(p)
+            await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    lags.sort()
+    return elapsed, lags[len(lags) // 2], lags[int(len(lags) * 0.99)], lags[-1]
+
+
+def make_sources(directory, count):
+    src = os.path.join(directory, "src.jpg")
+    Image.effect_noise((1920, 1080), 64).convert("RGB").save(src, "JPEG", quality=95)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"{i}.jpg")
+        shutil.copy(src, path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for offload in (False, True):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = make_sources(directory, count)
+            elapsed, p50, p99, worst = asyncio.run(run(paths, offload))
+        mode = "thread pool" if offload else "inline     "
+        print(
+            f"{mode}: {count} thumbs in {elapsed * 1000:7.1f} ms | loop lag "
+            f"p50 {p50 * 1000:6.2f} ms  p99 {p99 * 1000:6.2f} ms  max {worst * 1000:6.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
+import time
+
+# Measured from the first line so the "ready in" log includes import time
+STARTED = time.perf_counter()
+
 import logging
 import logging.config
+import os
 import warnings
 from pyrogram import Client, idle
 from pyrogram import Client, __version__
@@ -9,15 +15,28 @@ from aiohttp import web
 from pytz import timezone
 from datetime import datetime
 import asyncio
-from plugins.web_support import web_server
+from route import web_server
+from helper.broadcast import resume_broadcasts
+from helper.subscription import membership
+from helper.database import AshutoshGoswami24
+from helper.clients import client_pool
+from helper.downloader import downloader
+from helper.uploader import TransferClient
+from helper.workspace import workspaces
+from helper.journal import download_journal
+from helper.metrics import count_pyrogram_flood_waits, monitor_loop_lag
 import pyromod
 
-logging.config.fileConfig("logging.conf")
+if os.path.exists("logging.conf"):
+    logging.config.fileConfig("logging.conf")
+else:
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logging.getLogger().setLevel(logging.INFO)
 logging.getLogger("pyrogram").setLevel(logging.ERROR)
+count_pyrogram_flood_waits()
 
 
-class Bot(Client):
+class Bot(TransferClient):
     def __init__(self):
         super().__init__(
             name="AshutoshGoswami24",
@@ -30,17 +49,37 @@ class Bot(Client):
         )
 
     async def start(self):
-        await super().start()
+        # Telegram login and the MongoDB check don't depend on each other
+        await asyncio.gather(super().start(), AshutoshGoswami24.check_connection())
         me = await self.get_me()
         self.mention = me.mention
         self.username = me.username
-        app = web.AppRunner(await web_server())
-        await app.setup()
-        bind_address = "0.0.0.0"
-        await web.TCPSite(app, bind_address, Config.PORT).start()
-        logging.info(f"{me.first_name} ✅✅ BOT started successfully ✅✅")
 
-        for id in Config.ADMIN:
+        async def start_web():
+            app = web.AppRunner(await web_server())
+            await app.setup()
+            bind_address = "0.0.0.0"
+            await web.TCPSite(app, bind_address, Config.PORT).start()
+
+        await asyncio.gather(
+            start_web(),
+            membership.resolve(self),
+            resume_broadcasts(self),
+            AshutoshGoswami24.ensure_indexes(),
+            client_pool.start(self),
+        )
+        # Reclaims workspaces left by a crash now, then stale ones periodically
+        self.janitor = asyncio.create_task(workspaces.janitor(Config.JANITOR_INTERVAL))
+        self.partial_janitor = asyncio.create_task(download_journal.janitor(Config.JANITOR_INTERVAL))
+        self.loop_monitor = asyncio.create_task(monitor_loop_lag())
+        logging.info(
+            f"{me.first_name} ✅✅ BOT started successfully ✅✅ (ready in {time.perf_counter() - STARTED:.2f}s)"
+        )
+        # Users can be served already; the greetings go out in the background
+        self.notifications = asyncio.create_task(self.send_startup_notifications(me))
+
+    async def send_startup_notifications(self, me):
+        async def notify_admin(id):
             try:
                 await self.send_message(
                     id, f"**__{me.first_name}  Iꜱ Sᴛᴀʀᴛᴇᴅ.....✨️__**"
@@ -48,7 +87,7 @@ class Bot(Client):
             except:
                 pass
 
-        if Config.LOG_CHANNEL:
+        async def notify_log_channel():
             try:
                 curr = datetime.now(timezone("Asia/Kolkata"))
                 date = curr.strftime("%d %B, %Y")
@@ -60,7 +99,15 @@ class Bot(Client):
             except:
                 print("Pʟᴇᴀꜱᴇ Mᴀᴋᴇ Tʜɪꜱ Iꜱ Aᴅᴍɪɴ Iɴ Yᴏᴜʀ Lᴏɢ Cʜᴀɴɴᴇʟ")
 
+        tasks = [notify_admin(id) for id in Config.ADMIN]
+        if Config.LOG_CHANNEL:
+            tasks.append(notify_log_channel())
+        await asyncio.gather(*tasks)
+
     async def stop(self, *args):
+        # Pooled download sessions belong to the pool's clients, so they go first
+        await downloader.stop()
+        await client_pool.stop()
         await super().stop()
         logging.info("Bot Stopped 🙄")
 
@@ -69,17 +116,8 @@ bot_instance = Bot()
 
 
 def main():
-    async def start_services():
-        if Config.STRING_SESSION:
-            await asyncio.gather(
-                app.start(),  # Start the Pyrogram Client
-                bot_instance.start(),  # Start the bot instance
-            )
-        else:
-            await asyncio.gather(bot_instance.start())
-
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(start_services())
+    loop.run_until_complete(bot_instance.start())
     loop.run_forever()
 
 
@@ -7,9 +7,30 @@ class Config(object):
     API_HASH  = os.environ.get("API_HASH", "")
     BOT_TOKEN = os.environ.get("BOT_TOKEN", "") 
 
+    # extra sessions that share the transfers; they need POOL_CHANNEL, a channel
+    # where the main bot and every pool session can post and delete
+    POOL_BOT_TOKENS      = os.environ.get("POOL_BOT_TOKENS", "").split()
+    POOL_SESSIONS        = os.environ.get("POOL_SESSIONS", "").split()
+    POOL_CHANNEL         = int(os.environ.get("POOL_CHANNEL", "0"))
+    POOL_RETRIES         = int(os.environ.get("POOL_RETRIES", "3"))
+    POOL_HEALTH_INTERVAL = int(os.environ.get("POOL_HEALTH_INTERVAL", "60"))
+    POOL_SLEEP_THRESHOLD = int(os.environ.get("POOL_SLEEP_THRESHOLD", "5"))
+
     # database config
     DB_NAME = os.environ.get("DB_NAME","AshutoshGoswami24")     
     DB_URL  = os.environ.get("DB_URL","")
+    # "mongo" (DB_URL) or "sqlite" (one local file, for single-node deployments)
+    DB_BACKEND          = os.environ.get("DB_BACKEND", "mongo")
+    SQLITE_PATH         = os.environ.get("SQLITE_PATH", "data/bot.sqlite3")
+    DB_CONNECT_TIMEOUT  = int(os.environ.get("DB_CONNECT_TIMEOUT", "10"))
+    DB_POOL_SIZE        = int(os.environ.get("DB_POOL_SIZE", "50"))
+    # zlib is built in; zstd/snappy need the zstandard/python-snappy packages
+    DB_COMPRESSORS      = os.environ.get("DB_COMPRESSORS", "zlib")
+    DB_BATCH_SIZE       = int(os.environ.get("DB_BATCH_SIZE", "1000"))
+    USER_COUNT_TTL      = int(os.environ.get("USER_COUNT_TTL", "600"))
+    RESULT_STORE_TTL    = int(os.environ.get("RESULT_STORE_TTL", str(30 * 24 * 3600)))
+    SETTINGS_CACHE_TTL  = int(os.environ.get("SETTINGS_CACHE_TTL", "300"))
+    SETTINGS_CACHE_SIZE = int(os.environ.get("SETTINGS_CACHE_SIZE", "10000"))
  
     # other configs
     BOT_UPTIME  = time.time()
@@ -17,8 +38,75 @@ class Config(object):
     ADMIN       = [int(admin) if id_pattern.search(admin) else admin for admin in os.environ.get('ADMIN', '').split()]
     # -- FORCE_SUB_CHANNELS = ["BotzPW","AshuSupport","AshutoshGoswami24"] -- # 
     FORCE_SUB_CHANNELS = os.environ.get('FORCE_SUB_CHANNELS', 'AshutoshGoswami24,BotzPW').split(',')
+    FORCE_SUB_POSITIVE_TTL = int(os.environ.get("FORCE_SUB_POSITIVE_TTL", "600"))
+    FORCE_SUB_NEGATIVE_TTL = int(os.environ.get("FORCE_SUB_NEGATIVE_TTL", "30"))
     LOG_CHANNEL = int(os.environ.get("LOG_CHANNEL", ""))
     PORT = int(os.environ.get("PORT", ""))
+
+    # rename job scheduler
+    MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", "10"))
+    MAX_JOBS_PER_USER   = int(os.environ.get("MAX_JOBS_PER_USER", "2"))
+    MAX_QUEUED_PER_USER = int(os.environ.get("MAX_QUEUED_PER_USER", "100"))
+    NETWORK_CONCURRENCY = int(os.environ.get("NETWORK_CONCURRENCY", "8"))
+    # parallel ranged downloads: one part per DOWNLOAD_PART_MIN_BYTES, up to DOWNLOAD_PARTS
+    DOWNLOAD_PARTS          = int(os.environ.get("DOWNLOAD_PARTS", "8"))
+    DOWNLOAD_PART_MIN_BYTES = int(os.environ.get("DOWNLOAD_PART_MIN_BYTES", str(16 * 1024 * 1024)))
+    DOWNLOAD_SEGMENT_CHUNKS = int(os.environ.get("DOWNLOAD_SEGMENT_CHUNKS", "8"))  # 1 MiB chunks per segment
+    # parallel part uploads (files over 10 MiB): one part in flight per UPLOAD_PART_MIN_BYTES
+    UPLOAD_PARTS_IN_FLIGHT  = int(os.environ.get("UPLOAD_PARTS_IN_FLIGHT", "16"))
+    UPLOAD_PART_MIN_BYTES   = int(os.environ.get("UPLOAD_PART_MIN_BYTES", str(8 * 1024 * 1024)))
+    UPLOAD_CONNECTIONS      = int(os.environ.get("UPLOAD_CONNECTIONS", "4"))
+    UPLOAD_PART_RETRIES     = int(os.environ.get("UPLOAD_PART_RETRIES", "5"))
+    # downloads of at least RESUME_MIN_BYTES survive crashes and restarts in PARTIAL_DIR
+    RESUME_MIN_BYTES        = int(os.environ.get("RESUME_MIN_BYTES", str(64 * 1024 * 1024)))
+    PARTIAL_DIR             = os.environ.get("PARTIAL_DIR", "downloads/partial")
+    PARTIAL_MAX_AGE         = int(os.environ.get("PARTIAL_MAX_AGE", str(24 * 3600)))
+    # 0 sizes the ffmpeg pool from the usable cores, capped at FFMPEG_DISK_STREAMS
+    FFMPEG_CONCURRENCY  = int(os.environ.get("FFMPEG_CONCURRENCY", "0"))
+    FFMPEG_DISK_STREAMS = int(os.environ.get("FFMPEG_DISK_STREAMS", "4"))
+    FFMPEG_TIMEOUT      = int(os.environ.get("FFMPEG_TIMEOUT", "1800"))
+    STREAM_REMUX        = os.environ.get("STREAM_REMUX", "True").lower() in ("true", "1", "yes")
+    THUMB_CACHE_DIR     = os.environ.get("THUMB_CACHE_DIR", "thumbs")
+    THUMB_CACHE_BYTES   = int(os.environ.get("THUMB_CACHE_BYTES", str(64 * 1024 * 1024)))
+    THUMB_WORKERS       = int(os.environ.get("THUMB_WORKERS", "2"))
+    # ffprobe on the first PROBE_HEAD_BYTES of a file fills {resolution}, durations and dimensions
+    PROBE_HEAD_BYTES    = int(os.environ.get("PROBE_HEAD_BYTES", str(2 * 1024 * 1024)))
+    PROBE_TIMEOUT       = int(os.environ.get("PROBE_TIMEOUT", "30"))
+    PROBE_CACHE_SIZE    = int(os.environ.get("PROBE_CACHE_SIZE", "20000"))
+    PROBE_CACHE_TTL     = int(os.environ.get("PROBE_CACHE_TTL", "86400"))
+    RESULT_CACHE_TTL    = int(os.environ.get("RESULT_CACHE_TTL", "3600"))
+    RESULT_CACHE_SIZE   = int(os.environ.get("RESULT_CACHE_SIZE", "20000"))
+    # per-job temp directories and disk admission control
+    WORKSPACE_DIR           = os.environ.get("WORKSPACE_DIR", "downloads/jobs")
+    FAST_WORKSPACE_DIR      = os.environ.get("FAST_WORKSPACE_DIR", "")  # e.g. /dev/shm/autorename
+    FAST_WORKSPACE_MAX_FILE = int(os.environ.get("FAST_WORKSPACE_MAX_FILE", str(64 * 1024 * 1024)))
+    DISK_HEADROOM           = int(os.environ.get("DISK_HEADROOM", str(512 * 1024 * 1024)))
+    DISK_WAIT_TIMEOUT       = int(os.environ.get("DISK_WAIT_TIMEOUT", "600"))
+    WORKSPACE_MAX_AGE       = int(os.environ.get("WORKSPACE_MAX_AGE", "3600"))
+    JANITOR_INTERVAL        = int(os.environ.get("JANITOR_INTERVAL", "900"))
+
+    # per-job span timelines in Chrome trace format ("" disables)
+    TRACE_LOG         = os.environ.get("TRACE_LOG", "logs/jobs.trace.json")
+    TRACE_LOG_BYTES   = int(os.environ.get("TRACE_LOG_BYTES", str(10 * 1024 * 1024)))
+    TRACE_LOG_BACKUPS = int(os.environ.get("TRACE_LOG_BACKUPS", "3"))
+    PROFILE_MAX_SECONDS = int(os.environ.get("PROFILE_MAX_SECONDS", "600"))
+
+    # files a user sends within BATCH_WINDOW seconds are renamed as one pipelined batch (0 disables)
+    BATCH_WINDOW        = float(os.environ.get("BATCH_WINDOW", "0"))
+    BATCH_MAX_FILES     = int(os.environ.get("BATCH_MAX_FILES", "50"))
+    BATCH_MEDIA_GROUP   = os.environ.get("BATCH_MEDIA_GROUP", "False").lower() in ("true", "1", "yes")
+
+    # progress messages
+    PROGRESS_INTERVAL      = float(os.environ.get("PROGRESS_INTERVAL", "5"))
+    PROGRESS_EDITS_PER_SEC = float(os.environ.get("PROGRESS_EDITS_PER_SEC", "20"))
+
+    # broadcast
+    BROADCAST_WORKERS             = int(os.environ.get("BROADCAST_WORKERS", "20"))
+    BROADCAST_RATE                = float(os.environ.get("BROADCAST_RATE", "25"))
+    BROADCAST_BATCH               = int(os.environ.get("BROADCAST_BATCH", "500"))
+    BROADCAST_RETRIES             = int(os.environ.get("BROADCAST_RETRIES", "3"))
+    BROADCAST_REPORT_INTERVAL     = float(os.environ.get("BROADCAST_REPORT_INTERVAL", "10"))
+    BROADCAST_CHECKPOINT_INTERVAL = float(os.environ.get("BROADCAST_CHECKPOINT_INTERVAL", "2"))
     
     # wes response configuration     
     WEBHOOK = bool(os.environ.get("WEBHOOK", "True"))
@@ -0,0 +1,216 @@
+import asyncio
+import datetime
+import logging
+import time
+
+from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid
+
+from config import Config
+from .database import AshutoshGoswami24
+from .metrics import FLOOD_WAITS
+
+logger = logging.getLogger(__name__)
+
+DEAD_USER_ERRORS = (InputUserDeactivated, UserIsBlocked, PeerIdInvalid)
+
+# Broadcasts currently running in this process, keyed by checkpoint id
+active_broadcasts = {}
+_tasks = set()
+
+
+class RateLimiter:
+    """Async token bucket whose rate adapts to FloodWait.
+
+    A FloodWait pauses every sender for the requested time and halves the
+    rate; each successful send then adds a little back until ``max_rate``.
+    """
+
+    def __init__(self, rate, min_rate=1.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def flood_wait(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def success(self):
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + 0.1)
+
+
+class Broadcast:
+    """Copies one message to every user with bounded concurrency.
+
+    Users are walked in ``_id`` order in batches. Every
+    ``BROADCAST_CHECKPOINT_INTERVAL`` seconds and after each batch, dead users
+    are removed with one ``delete_many`` and the position is checkpointed to
+    the ``broadcasts`` collection. The position is the last user before which
+    every send has finished, so a restarted bot only repeats the sends that
+    were in flight or finished since the last checkpoint.
+    """
+
+    def __init__(self, bot, state):
+        self.bot = bot
+        self.state = state
+        self.limiter = RateLimiter(Config.BROADCAST_RATE)
+        self._senders = asyncio.Semaphore(Config.BROADCAST_WORKERS)
+        self._dead = []
+        self._last_report = 0.0
+        self._last_checkpoint = time.monotonic()
+        self._started = None
+
+    @classmethod
+    async def create(cls, bot, source_msg, status_msg):
+        state = {
+            "_id": f"{source_msg.chat.id}:{source_msg.id}",
+            "source_chat_id": source_msg.chat.id,
+            "source_message_id": source_msg.id,
+            "status_chat_id": status_msg.chat.id,
+            "status_message_id": status_msg.id,
+            "total": await AshutoshGoswami24.total_users_count(exact=True),
+            "last_user_id": None,
+            "done": 0,
+            "success": 0,
+            "failed": 0,
+            "removed": 0,
+            "flood_waits": 0,
+            "elapsed": 0.0,
+            "status": "running",
+        }
+        await AshutoshGoswami24.save_broadcast(state)
+        return cls(bot, state)
+
+    async def run(self):
+        self._started = time.monotonic() - self.state["elapsed"]
+        try:
+            while True:
+                user_ids = await AshutoshGoswami24.get_user_ids_after(
+                    self.state["last_user_id"], Config.BROADCAST_BATCH
+                )
+                if not user_ids:
+                    break
+                finished = [False] * len(user_ids)
+                cursor = 0
+
+                async def send(index, user_id):
+                    nonlocal cursor
+                    await self._send(user_id)
+                    finished[index] = True
+                    # Sends finish out of order; only the finished prefix is safe to skip on resume
+                    while cursor < len(user_ids) and finished[cursor]:
+                        self.state["last_user_id"] = user_ids[cursor]
+                        self.state["done"] += 1
+                        cursor += 1
+                    await self._checkpoint()
+
+                await asyncio.gather(*(send(index, user_id) for index, user_id in enumerate(user_ids)))
+                await self._checkpoint(force=True)
+                await self._report()
+            self.state["status"] = "done"
+            await self._checkpoint(force=True)
+            await self._report(final=True)
+        finally:
+            active_broadcasts.pop(self.state["_id"], None)
+
+    async def _checkpoint(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_checkpoint < Config.BROADCAST_CHECKPOINT_INTERVAL:
+            return
+        self._last_checkpoint = now
+        dead, self._dead = self._dead, []
+        self.state["removed"] += await AshutoshGoswami24.delete_users(dead)
+        self.state["elapsed"] = time.monotonic() - self._started
+        await AshutoshGoswami24.save_broadcast(self.state)
+
+    async def _send(self, user_id):
+        async with self._senders:
+            for _ in range(Config.BROADCAST_RETRIES):
+                await self.limiter.acquire()
+                try:
+                    await self.bot.copy_message(
+                        chat_id=user_id,
+                        from_chat_id=self.state["source_chat_id"],
+                        message_id=self.state["source_message_id"],
+                    )
+                    self.limiter.success()
+                    self.state["success"] += 1
+                    return
+                except FloodWait as e:
+                    self.state["flood_waits"] += 1
+                    FLOOD_WAITS.labels("broadcast").inc()
+                    self.limiter.flood_wait(e.value)
+                except DEAD_USER_ERRORS as e:
+                    logger.info(f"{user_id} : {type(e).__name__}")
+                    self._dead.append(user_id)
+                    break
+                except Exception as e:
+                    logger.error(f"{user_id} : {e}")
+                    break
+            self.state["failed"] += 1
+
+    async def _report(self, final=False):
+        now = time.monotonic()
+        if not final and now - self._last_report < Config.BROADCAST_REPORT_INTERVAL:
+            return
+        self._last_report = now
+        s = self.state
+        if final:
+            completed_in = datetime.timedelta(seconds=int(s["elapsed"]))
+            text = (
+                f"Bʀᴏᴀᴅᴄᴀꜱᴛ Cᴏᴍᴩʟᴇᴛᴇᴅ: \nCᴏᴍᴩʟᴇᴛᴇᴅ Iɴ `{completed_in}`.\n\n"
+                f"Total Users {s['total']}\nCompleted: {s['done']} / {s['total']}\n"
+                f"Success: {s['success']}\nFailed: {s['failed']}\nRemoved: {s['removed']}"
+            )
+        else:
+            text = (
+                f"Broadcast In Progress: \n\nTotal Users {s['total']} \n"
+                f"Completed : {s['done']} / {s['total']}\nSuccess : {s['success']}\n"
+                f"Failed : {s['failed']}\nRemoved : {s['removed']}\n"
+                f"Rate : {self.limiter.rate:.1f} msg/s"
+            )
+        try:
+            await self.bot.edit_message_text(s["status_chat_id"], s["status_message_id"], text)
+        except Exception as e:
+            logger.warning(f"Could not update broadcast status: {e}")
+
+
+def start_broadcast(broadcast):
+    active_broadcasts[broadcast.state["_id"]] = broadcast
+    task = asyncio.create_task(broadcast.run())
+    _tasks.add(task)
+    task.add_done_callback(_finished)
+    return task
+
+
+def _finished(task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error(f"Broadcast failed: {task.exception()}")
+
+
+async def resume_broadcasts(bot):
+    """Restart broadcasts that were checkpointed but not finished before a restart."""
+    for state in await AshutoshGoswami24.get_unfinished_broadcasts():
+        if state["_id"] in active_broadcasts:
+            continue
+        logger.info(f"Resuming broadcast {state['_id']} after user {state['last_user_id']}")
+        start_broadcast(Broadcast(bot, state))
@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import time
+
+from pyrogram.errors import FloodWait
+
+from config import Config
+from .metrics import FLOOD_WAITS, POOL_TRANSFERS
+from .uploader import TransferClient
+
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    """One Telegram client of the pool with its load and health."""
+
+    def __init__(self, name, client, primary=False):
+        self.name = name
+        self.client = client
+        self.primary = primary
+        self.active = 0
+        self.transfers = 0
+        self.flood_waits = 0
+        self.flood_until = 0.0
+        self.failures = 0
+        self.healthy = True
+
+    @property
+    def available(self):
+        return self.healthy and time.monotonic() >= self.flood_until
+
+
+class ClientPool:
+    """Spreads downloads and uploads over several bot tokens and user sessions.
+
+    Every transfer runs on the least-loaded healthy session. A FloodWait only
+    benches the session that got it, and the transfer is retried on another
+    one. Helper sessions can't see the users' chats, so their files pass
+    through ``relay_chat``, a channel every session is a member of: the main
+    bot copies the source message there for a helper to download, and copies a
+    helper's upload from there to the user. The copies are server side and the
+    relay messages are deleted afterwards.
+    """
+
+    def __init__(self, relay_chat=0, retries=3, health_interval=60, max_failures=3):
+        self.relay_chat = relay_chat
+        self.retries = retries
+        self.health_interval = health_interval
+        self.max_failures = max_failures
+        self.sessions = []
+        self.primary = None
+        self._changed = asyncio.Event()
+        self._health = None
+
+    def add(self, name, client, primary=False):
+        session = Session(name, client, primary)
+        self.sessions.append(session)
+        if primary:
+            self.primary = session
+        POOL_TRANSFERS.labels(name).set_function(lambda: session.active)
+        return session
+
+    async def start(self, primary, extra=None):
+        """Register the already started main client and start the helper sessions.
+
+        ``extra`` is a list of ``(name, client)``, by default built from
+        ``POOL_BOT_TOKENS`` and ``POOL_SESSIONS``.
+        """
+        self.add("main", primary, primary=True)
+        extra = config_clients() if extra is None else extra
+        if extra and not self.relay_chat:
+            logger.warning("POOL_BOT_TOKENS/POOL_SESSIONS need POOL_CHANNEL; using the main bot only")
+            extra = []
+        helpers = [self.add(name, client) for name, client in extra]
+        results = await asyncio.gather(*(s.client.start() for s in helpers), return_exceptions=True)
+        for session, result in zip(helpers, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Client session {session.name} failed to start: {result}")
+                session.healthy = False
+        if helpers:
+            self._health = asyncio.create_task(self._check_health())
+            logger.info(f"Client pool: {sum(s.healthy for s in self.sessions)}/{len(self.sessions)} sessions up")
+
+    async def stop(self):
+        if self._health:
+            self._health.cancel()
+        for session in self.sessions:
+            if not session.primary and session.healthy:
+                try:
+                    await session.client.stop()
+                except Exception as e:
+                    logger.warning(f"Client session {session.name} did not stop cleanly: {e}")
+
+    def pick(self, exclude=()):
+        """The least-loaded available session, or None while all are benched."""
+        candidates = [s for s in self.sessions if s not in exclude] or self.sessions
+        available = [s for s in candidates if s.available]
+        if available:
+            return min(available, key=lambda s: (s.active, s.transfers, not s.primary))
+        if not any(s.healthy for s in self.sessions):
+            # Nothing is known to work; keep trying the main bot rather than stall
+            return self.primary
+        return None
+
+    async def _acquire(self, exclude=()):
+        while True:
+            session = self.pick(exclude)
+            if session is not None:
+                session.active += 1
+                session.transfers += 1
+                return session
+            # Everything is benched: wait for a transfer to end or the first FloodWait to expire
+            wake = min(s.flood_until for s in self.sessions if s.healthy) - time.monotonic()
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), max(wake, 0.05))
+            except asyncio.TimeoutError:
+                pass
+
+    def _release(self, session):
+        session.active -= 1
+        self._changed.set()
+
+    def backoff(self, session, seconds):
+        session.flood_waits += 1
+        session.flood_until = max(session.flood_until, time.monotonic() + seconds)
+        FLOOD_WAITS.labels("pool").inc()
+        logger.warning(f"Client session {session.name} got FloodWait {seconds}s")
+
+    async def run(self, func):
+        """Await ``func(session)`` on the least-loaded session.
+
+        A FloodWait benches that session and the call is retried on another
+        one, up to ``retries`` attempts.
+        """
+        tried = []
+        for attempt in range(self.retries):
+            session = await self._acquire(exclude=tried)
+            try:
+                result = await func(session)
+                session.failures = 0
+                return result
+            except FloodWait as e:
+                self.backoff(session, e.value)
+                if attempt == self.retries - 1:
+                    raise
+                tried.append(session)
+            except (ConnectionError, OSError, asyncio.TimeoutError):
+                if not session.primary:
+                    self._failed(session)
+                raise
+            finally:
+                self._release(session)
+
+    async def download(self, message, func):
+        """Await ``func(client, message)`` with the message as seen by the chosen session."""
+
+        async def attempt(session):
+            if session.primary:
+                return await func(session.client, message)
+            relayed = await message.copy(self.relay_chat)
+            try:
+                copy = await session.client.get_messages(self.relay_chat, relayed.id)
+                return await func(session.client, copy)
+            finally:
+                await _delete_quietly(relayed)
+
+        return await self.run(attempt)
+
+    async def upload(self, chat_id, send):
+        """Await ``send(client, chat_id)`` on the chosen session; the result always comes from the main bot."""
+
+        async def attempt(session):
+            if session.primary:
+                return await send(session.client, chat_id)
+            sent = await send(session.client, self.relay_chat)
+            try:
+                return await self.primary.client.copy_message(chat_id, self.relay_chat, sent.id)
+            finally:
+                await _delete_quietly(sent)
+
+        return await self.run(attempt)
+
+    def _failed(self, session):
+        session.failures += 1
+        if session.failures >= self.max_failures and session.healthy:
+            session.healthy = False
+            logger.error(f"Client session {session.name} marked unhealthy")
+
+    async def _check_health(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for session in self.sessions:
+                if session.primary:
+                    continue
+                try:
+                    if not getattr(session.client, "is_connected", True):
+                        await session.client.start()
+                    await asyncio.wait_for(session.client.get_me(), 10)
+                except FloodWait as e:
+                    self.backoff(session, e.value)
+                except Exception as e:
+                    if session.healthy:
+                        logger.error(f"Client session {session.name} marked unhealthy: {e}")
+                    session.healthy = False
+                else:
+                    if not session.healthy:
+                        logger.info(f"Client session {session.name} is healthy again")
+                    session.failures = 0
+                    session.healthy = True
+                    self._changed.set()
+
+    def stats(self):
+        return [
+            {
+                "name": s.name,
+                "active": s.active,
+                "transfers": s.transfers,
+                "flood_waits": s.flood_waits,
+                "benched": max(0, round(s.flood_until - time.monotonic())),
+                "healthy": s.healthy,
+            }
+            for s in self.sessions
+        ]
+
+
+async def _delete_quietly(message):
+    try:
+        await message.delete()
+    except Exception as e:
+        logger.warning(f"Could not delete relay message {message.id}: {e}")
+
+
+def config_clients():
+    """Helper sessions from ``POOL_BOT_TOKENS`` and ``POOL_SESSIONS``."""
+    common = dict(
+        api_id=Config.API_ID,
+        api_hash=Config.API_HASH,
+        in_memory=True,
+        no_updates=True,
+        # Longer waits are raised so the pool can move the transfer elsewhere
+        sleep_threshold=Config.POOL_SLEEP_THRESHOLD,
+    )
+    clients = [
+        (f"bot{i}", TransferClient(name=f"pool-bot{i}", bot_token=token, **common))
+        for i, token in enumerate(Config.POOL_BOT_TOKENS, 1)
+    ]
+    clients += [
+        (f"user{i}", TransferClient(name=f"pool-user{i}", session_string=session, **common))
+        for i, session in enumerate(Config.POOL_SESSIONS, 1)
+    ]
+    return clients
+
+
+client_pool = ClientPool(Config.POOL_CHANNEL, Config.POOL_RETRIES, Config.POOL_HEALTH_INTERVAL)
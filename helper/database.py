@@ -1,20 +1,51 @@
-import motor.motor_asyncio
+import asyncio
+import time
 from config import Config
 import logging  # Added for logging errors and important information
 from .utils import send_log
+from .cache import TTLCache
+from .storage import create_storage
+
+# Fields read on the rename hot path; fetched together in one projected find_one
+SETTINGS_FIELDS = {
+    "file_id": None,
+    "caption": None,
+    "format_template": None,
+    "media_type": None,
+    "metadata": None,
+    "metadata_code": None,
+    "extract_source": "filename",
+}
 
 
 class Database:
-    def __init__(self, uri, database_name):
+    def __init__(self, storage):
+        # MongoStorage or SQLiteStorage; see helper/storage.py
+        self.storage = storage
+        self._settings_cache = TTLCache(
+            maxsize=Config.SETTINGS_CACHE_SIZE, ttl=Config.SETTINGS_CACHE_TTL
+        )
+        # Exact user count, refreshed every USER_COUNT_TTL seconds and kept
+        # current in between by add_user / delete_users
+        self._user_count = None
+        self._user_count_at = 0.0
+
+    async def check_connection(self, timeout=None):
+        """Ping the storage, raising if it does not answer within ``timeout`` seconds."""
+        timeout = Config.DB_CONNECT_TIMEOUT if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self.storage.ping(), timeout)
+            logging.info(f"Successfully connected to {self.storage.name}")
+        except Exception as e:
+            logging.error(f"Failed to connect to {self.storage.name}: {e}")
+            raise
+
+    async def ensure_indexes(self):
+        """Create the indexes the queries below rely on (``_id`` is always indexed)."""
         try:
-            self._client = motor.motor_asyncio.AsyncIOMotorClient(uri)
-            self._client.server_info()  # This will raise an exception if the connection fails
-            logging.info("Successfully connected to MongoDB")
+            await self.storage.ensure_indexes()
         except Exception as e:
-            logging.error(f"Failed to connect to MongoDB: {e}")
-            raise e  # Re-raise the exception after logging it
-        self.AshutoshGoswami24 = self._client[database_name]
-        self.col = self.AshutoshGoswami24.user
+            logging.error(f"Error creating indexes: {e}")
 
     def new_user(self, id):
         return dict(
@@ -26,151 +57,248 @@ class Database:
             format_template=None,
         )
 
+    async def get_settings(self, id):
+        """Return a dict with every per-user setting, served from cache when possible."""
+        id = int(id)
+        settings = self._settings_cache.get(id)
+        if settings is not None:
+            return settings
+        try:
+            user = await self.storage.get_user(id, SETTINGS_FIELDS)
+        except Exception as e:
+            logging.error(f"Error getting settings for user {id}: {e}")
+            return dict(SETTINGS_FIELDS)
+        settings = dict(SETTINGS_FIELDS)
+        if user:
+            settings.update({k: v for k, v in user.items() if k in SETTINGS_FIELDS})
+        self._settings_cache.set(id, settings)
+        return settings
+
+    async def _set_setting(self, id, field, value):
+        id = int(id)
+        try:
+            matched = await self.storage.set_user_field(id, field, value)
+        except Exception:
+            # The stored value is unknown now, make the next read go to storage
+            self._settings_cache.pop(id)
+            raise
+        if not matched:
+            # Nothing was written for an unknown user; don't cache a value storage doesn't have
+            self._settings_cache.pop(id)
+            return
+        settings = self._settings_cache.peek(id)
+        if settings is not None:
+            settings = dict(settings, **{field: value})
+            self._settings_cache.set(id, settings)
+
+    def invalidate_settings(self, id=None):
+        if id is None:
+            self._settings_cache.clear()
+        else:
+            self._settings_cache.pop(int(id))
+
+    def settings_cache_stats(self):
+        return self._settings_cache.stats()
+
     async def add_user(self, b, m):
         u = m.from_user
-        if not await self.is_user_exist(u.id):
-            user = self.new_user(u.id)
-            try:
-                await self.col.insert_one(user)
-                await send_log(b, u)
-            except Exception as e:
-                logging.error(f"Error adding user {u.id}: {e}")
+        user = self.new_user(u.id)
+        del user["_id"]
+        try:
+            inserted = await self.storage.insert_user(int(u.id), user)
+        except Exception as e:
+            logging.error(f"Error adding user {u.id}: {e}")
+            return
+        if inserted:
+            # Settings read before the insert were cached as the empty defaults
+            self._settings_cache.pop(int(u.id))
+            if self._user_count is not None:
+                self._user_count += 1
+            await send_log(b, u)
 
     async def is_user_exist(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
-            return bool(user)
+            return bool(await self.storage.get_user(int(id), ()))
         except Exception as e:
             logging.error(f"Error checking if user {id} exists: {e}")
             return False
 
-    async def total_users_count(self):
+    async def total_users_count(self, exact=False):
+        """Number of users: estimated (free on Mongo), or with ``exact`` a cached full count."""
         try:
-            count = await self.col.count_documents({})
-            return count
+            if not exact:
+                return await self.storage.count_users(estimated=True)
+            if self._user_count is None or time.monotonic() - self._user_count_at > Config.USER_COUNT_TTL:
+                self._user_count = await self.storage.count_users()
+                self._user_count_at = time.monotonic()
+            return self._user_count
         except Exception as e:
             logging.error(f"Error counting users: {e}")
             return 0
 
     async def get_all_users(self):
+        """Async iterable of ``{"_id": user_id}`` for every user."""
         try:
-            all_users = self.col.find({})
-            return all_users
+            return self.storage.find_users(Config.DB_BATCH_SIZE)
         except Exception as e:
             logging.error(f"Error getting all users: {e}")
             return None
 
+    async def get_user_ids_after(self, after_id=None, limit=500):
+        """Return up to `limit` user ids greater than `after_id`, in ascending order."""
+        after_id = int(after_id) if after_id is not None else None
+        try:
+            return await self.storage.user_ids_after(after_id, limit)
+        except Exception as e:
+            logging.error(f"Error getting user ids after {after_id}: {e}")
+            return []
+
+    async def delete_users(self, user_ids):
+        ids = [int(user_id) for user_id in user_ids]
+        if not ids:
+            return 0
+        try:
+            deleted = await self.storage.delete_users(ids)
+            for user_id in ids:
+                self._settings_cache.pop(user_id)
+            if self._user_count is not None:
+                self._user_count -= deleted
+            return deleted
+        except Exception as e:
+            logging.error(f"Error deleting {len(ids)} users: {e}")
+            return 0
+
+    async def save_broadcast(self, state):
+        try:
+            await self.storage.save_broadcast(state)
+        except Exception as e:
+            logging.error(f"Error saving broadcast checkpoint {state.get('_id')}: {e}")
+
+    async def get_unfinished_broadcasts(self):
+        try:
+            return await self.storage.unfinished_broadcasts()
+        except Exception as e:
+            logging.error(f"Error getting unfinished broadcasts: {e}")
+            return []
+
+    async def get_cached_result(self, key):
+        try:
+            return await self.storage.get_result(key)
+        except Exception as e:
+            logging.error(f"Error getting cached result {key}: {e}")
+            return None
+
+    async def set_cached_result(self, key, file_id):
+        try:
+            await self.storage.set_result(key, file_id)
+        except Exception as e:
+            logging.error(f"Error saving cached result {key}: {e}")
+
+    async def delete_cached_result(self, key):
+        try:
+            await self.storage.delete_result(key)
+        except Exception as e:
+            logging.error(f"Error deleting cached result {key}: {e}")
+
     async def delete_user(self, user_id):
         try:
-            await self.col.delete_many({"_id": int(user_id)})
+            deleted = await self.storage.delete_users([int(user_id)])
+            self._settings_cache.pop(int(user_id))
+            if self._user_count is not None:
+                self._user_count -= deleted
         except Exception as e:
             logging.error(f"Error deleting user {user_id}: {e}")
 
     async def set_thumbnail(self, id, file_id):
         try:
-            await self.col.update_one({"_id": int(id)}, {"$set": {"file_id": file_id}})
+            await self._set_setting(id, "file_id", file_id)
         except Exception as e:
             logging.error(f"Error setting thumbnail for user {id}: {e}")
 
     async def get_thumbnail(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
-            return user.get("file_id", None) if user else None
+            return (await self.get_settings(id))["file_id"]
         except Exception as e:
             logging.error(f"Error getting thumbnail for user {id}: {e}")
             return None
 
     async def set_caption(self, id, caption):
         try:
-            await self.col.update_one({"_id": int(id)}, {"$set": {"caption": caption}})
+            await self._set_setting(id, "caption", caption)
         except Exception as e:
             logging.error(f"Error setting caption for user {id}: {e}")
 
     async def get_caption(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
-            return user.get("caption", None) if user else None
+            return (await self.get_settings(id))["caption"]
         except Exception as e:
             logging.error(f"Error getting caption for user {id}: {e}")
             return None
 
     async def set_format_template(self, id, format_template):
         try:
-            await self.col.update_one(
-                {"_id": int(id)}, {"$set": {"format_template": format_template}}
-            )
+            await self._set_setting(id, "format_template", format_template)
         except Exception as e:
             logging.error(f"Error setting format template for user {id}: {e}")
 
     async def get_format_template(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
-            return user.get("format_template", None) if user else None
+            return (await self.get_settings(id))["format_template"]
         except Exception as e:
             logging.error(f"Error getting format template for user {id}: {e}")
             return None
 
     async def set_media_preference(self, id, media_type):
         try:
-            await self.col.update_one(
-                {"_id": int(id)}, {"$set": {"media_type": media_type}}
-            )
+            await self._set_setting(id, "media_type", media_type)
         except Exception as e:
             logging.error(f"Error setting media preference for user {id}: {e}")
 
     async def get_media_preference(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
-            return user.get("media_type", None) if user else None
+            return (await self.get_settings(id))["media_type"]
         except Exception as e:
             logging.error(f"Error getting media preference for user {id}: {e}")
             return None
 
     async def set_metadata(self, id, bool_meta):
         try:
-            await self.col.update_one(
-                {"_id": int(id)}, {"$set": {"metadata": bool_meta}}
-            )
+            await self._set_setting(id, "metadata", bool_meta)
         except Exception as e:
             logging.error(f"Error setting metadata for user {id}: {e}")
 
     async def get_metadata(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
-            return user.get("metadata", None) if user else None
+            return (await self.get_settings(id))["metadata"]
         except Exception as e:
             logging.error(f"Error getting metadata for user {id}: {e}")
             return None
 
     async def set_metadata_code(self, id, metadata_code):
         try:
-            await self.col.update_one(
-                {"_id": int(id)}, {"$set": {"metadata_code": metadata_code}}
-            )
+            await self._set_setting(id, "metadata_code", metadata_code)
         except Exception as e:
             logging.error(f"Error setting metadata code for user {id}: {e}")
 
     async def get_metadata_code(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
-            return user.get("metadata_code", None) if user else None
+            return (await self.get_settings(id))["metadata_code"]
         except Exception as e:
             logging.error(f"Error getting metadata code for user {id}: {e}")
             return None
 
     async def set_extract_source(self, id, source_type):
         try:
-            await self.col.update_one({"_id": int(id)}, {"$set": {"extract_source": source_type}})
+            await self._set_setting(id, "extract_source", source_type)
         except Exception as e:
             logging.error(f"Error setting extract source for user {id}: {e}")
 
     async def get_extract_source(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
-            return user.get("extract_source", "filename") if user else "filename"
+            return (await self.get_settings(id))["extract_source"]
         except Exception as e:
             logging.error(f"Error getting extract source for user {id}: {e}")
             return "filename"
 
 
-AshutoshGoswami24 = Database(Config.DB_URL, Config.DB_NAME)
+AshutoshGoswami24 = Database(create_storage())
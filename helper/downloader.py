@@ -0,0 +1,222 @@
+import asyncio
+import os
+from collections import defaultdict
+
+from pyrogram import raw
+from pyrogram.errors import AuthBytesInvalid
+from pyrogram.file_id import FileId
+from pyrogram.session import Auth, Session
+
+from config import Config
+
+# Telegram serves files in 1 MiB GetFile requests; pyrogram's get_file counts offsets in these
+CHUNK_SIZE = 1024 * 1024
+
+
+class ParallelDownloader:
+    """Downloads a file as several byte ranges fetched at the same time.
+
+    ``client.download_media`` asks for one 1 MiB chunk at a time and waits a
+    full round trip between them, so a single download stays far below the
+    link's capacity. Here the file is cut into ``segment_chunks``-sized
+    segments that up to ``max_parts`` workers fetch concurrently, each writing
+    at its own offset of a preallocated file. Workers take the next free
+    segment when done, so a slow range doesn't hold the rest back.
+
+    pyrogram keeps one media session per DC and every ``get_file`` shares it,
+    so each worker gets a dedicated session (its own connection), as the
+    uploader does. Sessions are pooled per client and DC and handed back after
+    each download, so only the first downloads from a DC pay for connecting,
+    and a foreign DC's auth key is made and authorized once. ``stop`` closes
+    the pool. A single-worker download has nothing to spread and uses the
+    shared session.
+    """
+
+    def __init__(self, max_parts, part_min_bytes, segment_chunks):
+        self.max_parts = max_parts
+        self.part_min_bytes = part_min_bytes
+        self.segment_chunks = segment_chunks
+        # All keyed by (client, dc_id)
+        self._auth_keys = {}
+        self._auth_locks = defaultdict(asyncio.Lock)
+        self._idle = defaultdict(list)
+        self._stopped = False
+
+    def parts_for(self, size):
+        """One worker per ``part_min_bytes`` of file, up to ``max_parts``."""
+        return max(1, min(self.max_parts, size // self.part_min_bytes))
+
+    def segments(self, size):
+        """``(first_chunk, chunk_count)`` for every segment of a ``size``-byte file."""
+        chunks = -(-size // CHUNK_SIZE)
+        return [
+            (start, min(self.segment_chunks, chunks - start)) for start in range(0, chunks, self.segment_chunks)
+        ]
+
+    @staticmethod
+    def segment_bytes(segment, size):
+        first, count = segment
+        return min((first + count) * CHUNK_SIZE, size) - first * CHUNK_SIZE
+
+    async def open_session(self, client, dc_id):
+        """A new started media session to ``dc_id``, authorized as ``client``."""
+        test_mode = await client.storage.test_mode()
+        if dc_id == await client.storage.dc_id():
+            auth_key = await client.storage.auth_key()
+        else:
+            async with self._auth_locks[client, dc_id]:
+                auth_key = self._auth_keys.get((client, dc_id))
+                if auth_key is None:
+                    return await self._authorize(client, dc_id, test_mode)
+        session = Session(client, dc_id, auth_key, test_mode, is_media=True)
+        await session.start()
+        return session
+
+    async def _authorize(self, client, dc_id, test_mode):
+        # Another DC needs its own auth key and the authorization carried over, like get_file
+        # does; the authorization belongs to the key, so later sessions just reuse the key
+        auth_key = await Auth(client, dc_id, test_mode).create()
+        session = Session(client, dc_id, auth_key, test_mode, is_media=True)
+        await session.start()
+        try:
+            for _ in range(3):
+                exported = await client.invoke(raw.functions.auth.ExportAuthorization(dc_id=dc_id))
+                try:
+                    await session.invoke(raw.functions.auth.ImportAuthorization(id=exported.id, bytes=exported.bytes))
+                except AuthBytesInvalid:
+                    continue
+                self._auth_keys[client, dc_id] = auth_key
+                return session
+            raise AuthBytesInvalid
+        except BaseException:
+            await session.stop()
+            raise
+
+    async def acquire_sessions(self, client, dc_id, count):
+        """``count`` started sessions to ``dc_id``, idle pooled ones first; hand them back with ``release_sessions``."""
+        idle = self._idle[client, dc_id]
+        sessions = [idle.pop() for _ in range(min(count, len(idle)))]
+        opened = await asyncio.gather(
+            *(self.open_session(client, dc_id) for _ in range(count - len(sessions))), return_exceptions=True
+        )
+        sessions += [session for session in opened if not isinstance(session, BaseException)]
+        if len(sessions) < count:
+            await self.release_sessions(client, dc_id, sessions)
+            raise next(error for error in opened if isinstance(error, BaseException))
+        return sessions
+
+    async def release_sessions(self, client, dc_id, sessions):
+        if self._stopped:
+            await asyncio.gather(*(session.stop() for session in sessions), return_exceptions=True)
+        else:
+            self._idle[client, dc_id].extend(sessions)
+
+    async def stop(self):
+        """Close the pooled sessions; sessions still in use are closed when released."""
+        self._stopped = True
+        sessions = [session for idle in self._idle.values() for session in idle]
+        self._idle.clear()
+        self._auth_keys.clear()
+        await asyncio.gather(*(session.stop() for session in sessions), return_exceptions=True)
+
+    @staticmethod
+    async def _get_chunks(session, location, first, count):
+        for chunk_index in range(first, first + count):
+            r = await session.invoke(
+                raw.functions.upload.GetFile(location=location, offset=chunk_index * CHUNK_SIZE, limit=CHUNK_SIZE),
+                sleep_threshold=30,
+            )
+            if not isinstance(r, raw.types.upload.File):
+                # Only requests with cdn_supported are redirected, which these are not
+                raise IOError(f"Unexpected GetFile result {type(r).__name__}")
+            yield r.bytes
+            if len(r.bytes) < CHUNK_SIZE:
+                return
+
+    async def download(self, client, message, path, progress=None):
+        """Download the message's media to ``path`` and return ``path``."""
+        media = message.document or message.video or message.audio
+        return await self.download_file(
+            client, FileId.decode(media.file_id), media.file_size, path, progress=progress
+        )
+
+    async def download_file(self, client, file_id, size, path, progress=None, segments=None, on_segment=None):
+        """Fetch ``segments`` (all of them by default) of a ``size``-byte file into ``path``.
+
+        ``on_segment(segment)`` is awaited after each segment is written.
+        """
+        segments = self.segments(size) if segments is None else list(segments)
+        loop = asyncio.get_running_loop()
+        fd = os.open(path, os.O_RDWR | os.O_CREAT)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.truncate(fd, size)
+            if hasattr(os, "posix_fallocate") and size:
+                try:
+                    # Reserve the blocks now so the positional writes can't hit ENOSPC halfway
+                    os.posix_fallocate(fd, 0, size)
+                except OSError:
+                    pass
+
+            queue = asyncio.Queue()
+            for segment in segments:
+                queue.put_nowait(segment)
+            # Segments not asked for are already on disk (a resumed download)
+            done = [size - sum(self.segment_bytes(segment, size) for segment in segments)]
+
+            async def report():
+                if progress:
+                    await progress(done[0], size)
+
+            async def worker(get_chunks):
+                while not queue.empty():
+                    segment = queue.get_nowait()
+                    first, count = segment
+                    offset = first * CHUNK_SIZE
+                    end = offset + self.segment_bytes(segment, size)
+                    async for chunk in get_chunks(first, count):
+                        await loop.run_in_executor(None, os.pwrite, fd, chunk, offset)
+                        offset += len(chunk)
+                        done[0] += len(chunk)
+                        await report()
+                    if offset < end:
+                        # get_file logs and swallows errors, it just stops yielding; a short read ends early too
+                        raise IOError(f"Download stopped at byte {offset} of segment ending at {end}")
+                    if on_segment:
+                        await on_segment(segment)
+
+            parts = min(self.parts_for(size), len(segments))
+            sessions = []
+            if parts > 1:
+                location = raw.types.InputDocumentFileLocation(
+                    id=file_id.media_id,
+                    access_hash=file_id.access_hash,
+                    file_reference=file_id.file_reference,
+                    thumb_size=file_id.thumbnail_size,
+                )
+                sessions = await self.acquire_sessions(client, file_id.dc_id, parts)
+                fetchers = [
+                    lambda first, n, session=session: self._get_chunks(session, location, first, n)
+                    for session in sessions
+                ]
+            else:
+                fetchers = [lambda first, n: client.get_file(file_id, size, limit=n, offset=first)] * parts
+            workers = [asyncio.create_task(worker(fetch)) for fetch in fetchers]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                raise
+            finally:
+                if sessions:
+                    await self.release_sessions(client, file_id.dc_id, sessions)
+        finally:
+            os.close(fd)
+        return path
+
+
+downloader = ParallelDownloader(
+    Config.DOWNLOAD_PARTS, Config.DOWNLOAD_PART_MIN_BYTES, Config.DOWNLOAD_SEGMENT_CHUNKS
+)
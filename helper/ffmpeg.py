@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+
+from config import Config
+from .metrics import FFMPEG_RUNNING, StageTimer
+
+logger = logging.getLogger(__name__)
+
+STDERR_LIMIT = 64 * 1024
+
+
+def usable_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 2
+
+
+def default_workers():
+    # Stream copy is mostly disk bound: past a few parallel writers a single
+    # disk spends its time seeking, however many cores there are.
+    return max(1, min(usable_cores(), Config.FFMPEG_DISK_STREAMS))
+
+
+async def _read_tail(stream, limit=STDERR_LIMIT):
+    tail = b""
+    while True:
+        chunk = await stream.read(4096)
+        if not chunk:
+            return tail
+        tail = (tail + chunk)[-limit:]
+
+
+def _number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+async def _read_progress(stream, total, duration, progress):
+    """Turn ``-progress`` key=value blocks into ``progress(current, total)`` calls.
+
+    ``current`` is in bytes so the usual progress bar applies: the larger of
+    the bytes written and the share of ``duration`` already muxed.
+    """
+    written = out_time = 0
+    async for raw in stream:
+        key, _, value = raw.decode(errors="replace").strip().partition("=")
+        if key == "total_size":
+            written = _number(value)
+        elif key == "out_time_us":
+            out_time = _number(value)
+        elif key == "progress" and progress and total:
+            if value == "end":
+                await progress(total, total)
+                continue
+            current = written
+            if duration:
+                current = max(current, int(total * out_time / (duration * 1_000_000)))
+            # Never report done before ffmpeg says so
+            await progress(min(current, total - 1), total)
+
+
+class FFmpegExecutor:
+    """Bounded pool of ffmpeg processes.
+
+    Processes are started with an argv (no shell), at most ``workers`` at a
+    time. Progress comes from ``-progress pipe:1``, only the last
+    ``STDERR_LIMIT`` bytes of stderr are kept, and a process still running
+    ``timeout`` seconds after its input ended is killed.
+    """
+
+    def __init__(self, workers, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self._slots = asyncio.Semaphore(workers)
+
+    async def run(self, args, output_path, feed=None, total=0, duration=0, progress=None, timeout=None):
+        """Run ``ffmpeg args`` writing ``output_path``; returns ``(ok, stderr_tail)``.
+
+        ``feed`` is an async iterable of byte chunks piped to stdin (use
+        ``pipe:0`` as the input); progress is then reported in bytes fed.
+        Otherwise it is parsed from ffmpeg against ``total`` input bytes and
+        the media ``duration`` in seconds, when known. A failed output is removed.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        async with self._slots:
+            self.running += 1
+            try:
+                with StageTimer("ffmpeg"):
+                    ok, stderr = await self._run(args, output_path, feed, total, duration, progress, timeout)
+            finally:
+                self.running -= 1
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        return ok, stderr
+
+    async def _run(self, args, output_path, feed, total, duration, progress, timeout):
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-hide_banner", "-nostats", "-y", "-progress", "pipe:1",
+            *args, output_path,
+            stdin=asyncio.subprocess.PIPE if feed is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stderr_task = asyncio.create_task(_read_tail(process.stderr))
+        progress_task = asyncio.create_task(
+            _read_progress(process.stdout, total, duration, progress if feed is None else None)
+        )
+        try:
+            if feed is not None:
+                await self._feed(process, feed, total, progress)
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            process.kill()
+            await process.wait()
+            stderr = await stderr_task
+            await self._finish(progress_task)
+            logger.warning(f"ffmpeg timed out after {timeout}s writing {output_path}")
+            return False, f"ffmpeg timed out after {timeout}s\n" + stderr.decode(errors="replace")
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            stderr_task.cancel()
+            progress_task.cancel()
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+        stderr = await stderr_task
+        await self._finish(progress_task)
+        if process.returncode != 0:
+            return False, stderr.decode(errors="replace")
+        return True, ""
+
+    @staticmethod
+    async def _finish(progress_task):
+        try:
+            await progress_task
+        except Exception as e:
+            logger.warning(f"ffmpeg progress callback failed: {e}")
+
+    @staticmethod
+    async def _feed(process, feed, total, progress):
+        current = 0
+        try:
+            async for chunk in feed:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+                current += len(chunk)
+                if progress:
+                    await progress(current, total)
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg exited early; its exit code and stderr explain why
+            pass
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+        }
+
+
+ffmpeg_pool = FFmpegExecutor(
+    workers=Config.FFMPEG_CONCURRENCY or default_workers(),
+    timeout=Config.FFMPEG_TIMEOUT,
+)
+FFMPEG_RUNNING.set_function(lambda: ffmpeg_pool.running)
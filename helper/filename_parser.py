@@ -0,0 +1,158 @@
+import os
+import re
+from functools import lru_cache
+
+# Separators in release names; used instead of \b so "Show_S01E05_1080p" tokenizes too
+_L = r"(?<![A-Za-z0-9])"
+_R = r"(?![A-Za-z0-9])"
+
+# One alternation, scanned once. It branches on the first character so most
+# positions fail after a check or two; within a branch earlier alternatives
+# win at a given position.
+TOKEN_RE = re.compile(
+    r"|".join(
+        [
+            r"\[(?:"
+            + r"|".join(
+                [
+                    r"(?<=^\[)(?P<group_lead>(?!\d+\])[^\]]+)\]",
+                    r"(?!(?:19|20)\d\d\])(?P<ep_br>\d{1,4})(?:v\d)?\]",
+                    r"(?P<crc>[0-9A-F]{8})\]",
+                ]
+            )
+            + r")",
+            r"-(?:"
+            + r"|".join(
+                [
+                    # The dash must start the name or follow a separator
+                    r"(?<![^\s._]-)[\s._]+(?!(?:19|20)\d\d" + _R + r")(?P<ep_dash>\d{1,4})(?:v\d)?" + _R,
+                    # "WEB-DL" and "WEB-Rip" are sources, not a release group
+                    r"(?<!WEB-)(?P<group_tail>[A-Za-z][A-Za-z0-9]*)$",
+                ]
+            )
+            + r")",
+            # Word tokens share one lookbehind so most positions fail after a single check,
+            # and the lookahead skips words that can't start any of them
+            _L
+            + r"(?=[0-9SEDAHXVTFOU])(?:"
+            + r"|".join(
+                [
+                    r"S(?P<se_s>\d{1,3})[._\s-]?(?:E|EP)(?P<se_e>\d{1,4})",
+                    r"(?P<x_s>\d{1,2})x(?P<x_e>\d{1,4})",
+                    r"(?P<res>(?:4320|2160|1440|1080|720|576|480|360)p|4K|UHD)",
+                    r"(?:E|EP|Episode[._\s]?)(?P<ep>\d{1,4})(?:v\d)?",
+                    r"(?P<audio>DUAL[._\s]?AUDIO|DUAL|DUB(?:BED)?|SUB(?:BED|S)?)",
+                    r"(?P<vcodec>[xh]\.?26[45]|HEVC|AVC|AV1|VP9)",
+                    r"(?P<depth>1[02][._-]?bit|8[._-]?bit)",
+                    r"(?P<acodec>E?AC3|AAC(?:2\.0|5\.1)?|FLAC|OPUS|DTS(?:-HD)?|TrueHD|DDP(?:5\.1|2\.0)?|DD(?:5\.1|2\.0))",
+                ]
+            )
+            + r")"
+            + _R,
+        ]
+    ),
+    # ASCII: release tags are ASCII, and case-folding stays a cheap table lookup
+    re.IGNORECASE | re.ASCII,
+)
+
+_TITLE_SEPARATORS = str.maketrans("._", "  ")
+_TITLE_STRIP = " -_."
+_EMPTY_BRACKETS = re.compile(r"\[\s*\]|\(\s*\)")
+_CLOSERS = {"]": "[", ")": "("}
+
+
+def _balance_brackets(text):
+    """Drop brackets left without a partner, e.g. when a token took one side."""
+    unmatched, stack = set(), []
+    for i, char in enumerate(text):
+        if char in "[(":
+            stack.append(i)
+        elif char in _CLOSERS:
+            if stack and text[stack[-1]] == _CLOSERS[char]:
+                stack.pop()
+            else:
+                unmatched.add(i)
+    unmatched.update(stack)
+    return "".join(char for i, char in enumerate(text) if i not in unmatched)
+
+
+def _clean_title(text):
+    text = " ".join(text.translate(_TITLE_SEPARATORS).split())
+    if "[" in text or "(" in text or "]" in text or ")" in text:
+        # Brackets emptied by the tokens removed from them; "Movie (2019)" keeps its pair
+        text, emptied = _balance_brackets(text), 1
+        while emptied:
+            text, emptied = _EMPTY_BRACKETS.subn(" ", text)
+        text = " ".join(text.split())
+    return text.strip(_TITLE_STRIP)
+
+
+def _audio_kind(token):
+    token = token.upper()
+    if "DUAL" in token:
+        return "dual"
+    if "SUB" in token:
+        return "sub"
+    return "dub"
+
+
+@lru_cache(maxsize=4096)
+def _parse(filename):
+    name = os.path.splitext(filename)[0]
+    season = episode = resolution = audio = codec = depth = audio_codec = group = None
+    title_parts = []
+    last = 0
+    for match in TOKEN_RE.finditer(name):
+        kind = match.lastgroup
+        value = match[kind]
+        if kind == "group_tail" and not (episode or resolution or codec or depth or audio_codec):
+            # "Spider-Man" is a title, "x265-GROUP" is a release tag
+            continue
+        if kind in ("se_e", "x_e"):
+            season = season or match[kind[:-1] + "s"]
+            episode = episode or value
+        elif kind in ("ep", "ep_br", "ep_dash"):
+            episode = episode or value
+        elif kind == "res":
+            resolution = resolution or ("4K" if value.upper() == "UHD" else value.upper())
+        elif kind == "audio":
+            audio = audio or _audio_kind(value)
+        elif kind == "vcodec":
+            codec = codec or value
+        elif kind == "depth":
+            depth = depth or value
+        elif kind == "acodec":
+            audio_codec = audio_codec or value
+        elif kind in ("group_lead", "group_tail"):
+            group = group or value
+        start, end = match.span()
+        title_parts.append(name[last:start])
+        last = end
+    title_parts.append(name[last:])
+    return (
+        _clean_title(" ".join(title_parts)),
+        season or "1",
+        episode or "1",
+        resolution or "",
+        audio or "",
+        # A bit depth only stands in for the codec when no codec is named
+        codec or depth or "",
+        audio_codec or "",
+        group or "",
+    )
+
+
+FIELDS = ("title", "season", "episode", "resolution", "audio", "codec", "audio_codec", "group")
+
+
+def extract_file_info(filename):
+    """Extract title, season, episode, resolution, audio, codecs and release group from a filename."""
+    return dict(zip(FIELDS, _parse(filename)))
+
+
+def extract_file_info_batch(filenames):
+    return [extract_file_info(name) for name in filenames]
+
+
+def parser_cache_info():
+    return _parse.cache_info()
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import zlib
+
+from pyrogram.file_id import FileId
+
+from config import Config
+from .downloader import CHUNK_SIZE, downloader
+
+logger = logging.getLogger(__name__)
+
+
+class _Partial:
+    """The on-disk state of one resumable download."""
+
+    def __init__(self, directory, unique_id, size, segment_chunks):
+        self.path = os.path.join(directory, f"{unique_id}.part")
+        self.journal_path = os.path.join(directory, f"{unique_id}.json")
+        self.size = size
+        self.segment_chunks = segment_chunks
+        # first chunk of a finished segment -> crc32 of its bytes
+        self.done = {}
+
+    def _read_segment(self, first):
+        nbytes = downloader.segment_bytes((first, self.segment_chunks), self.size)
+        with open(self.path, "rb") as f:
+            f.seek(first * CHUNK_SIZE)
+            return f.read(nbytes)
+
+    def load(self):
+        """Keep the finished segments whose bytes still match the journal."""
+        try:
+            with open(self.journal_path, encoding="utf-8") as f:
+                journal = json.load(f)
+            if (
+                journal["size"] != self.size
+                or journal["segment_chunks"] != self.segment_chunks
+                or os.path.getsize(self.path) != self.size
+            ):
+                return
+            for first, crc in journal["done"].items():
+                if zlib.crc32(self._read_segment(int(first))) == crc:
+                    self.done[int(first)] = crc
+        except (OSError, ValueError, KeyError):
+            self.done.clear()
+
+    def record(self, first):
+        """Flush a finished segment to disk, then mark it done in the journal."""
+        self.done[first] = zlib.crc32(self._read_segment(first))
+        with open(self.path, "rb") as f:
+            # The journal must never claim bytes a crash could still lose
+            if hasattr(os, "fdatasync"):
+                os.fdatasync(f.fileno())
+            else:
+                os.fsync(f.fileno())
+        tmp = f"{self.journal_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"size": self.size, "segment_chunks": self.segment_chunks, "done": self.done}, f)
+        os.replace(tmp, self.journal_path)
+
+    def remove(self):
+        for path in (self.path, self.journal_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class DownloadJournal:
+    """Lets a big download continue where it stopped after a crash, restart or retry.
+
+    The partial file for each ``file_unique_id`` is kept in ``directory``,
+    outside the job workspaces that failed jobs delete. A JSON journal next
+    to it lists the finished segments with their CRC32. Before resuming,
+    those segments are checked against the file and any that don't match
+    are fetched again. Finished downloads are moved into the job workspace.
+    """
+
+    def __init__(self, directory, min_bytes, max_age):
+        self.directory = os.path.abspath(directory)
+        self.min_bytes = min_bytes
+        self.max_age = max_age
+        self.resumed = 0
+        self.saved_bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def partial_path(self, unique_id):
+        return os.path.join(self.directory, f"{unique_id}.part")
+
+    async def download(self, client, message, path, progress=None):
+        """Download the message's media to ``path``, resuming an earlier attempt when there is one."""
+        media = message.document or message.video or message.audio
+        if media.file_size < self.min_bytes:
+            return await downloader.download(client, message, path, progress=progress)
+
+        loop = asyncio.get_running_loop()
+        partial = _Partial(self.directory, media.file_unique_id, media.file_size, downloader.segment_chunks)
+        await loop.run_in_executor(None, partial.load)
+        segments = [s for s in downloader.segments(media.file_size) if s[0] not in partial.done]
+        if partial.done:
+            saved = media.file_size - sum(downloader.segment_bytes(s, media.file_size) for s in segments)
+            self.resumed += 1
+            self.saved_bytes += saved
+            logger.info(f"Resuming download of {media.file_unique_id}, {saved} of {media.file_size} bytes on disk")
+
+        lock = asyncio.Lock()
+
+        async def on_segment(segment):
+            # Workers finish segments concurrently; the journal is rewritten by one at a time
+            async with lock:
+                await loop.run_in_executor(None, partial.record, segment[0])
+
+        await downloader.download_file(
+            client,
+            FileId.decode(media.file_id),
+            media.file_size,
+            partial.path,
+            progress=progress,
+            segments=segments,
+            on_segment=on_segment,
+        )
+        # shutil.move falls back to a copy when the workspace is on another filesystem
+        await loop.run_in_executor(None, shutil.move, partial.path, path)
+        await loop.run_in_executor(None, partial.remove)
+        return path
+
+    def sweep(self):
+        """Drop partial downloads nobody resumed within ``max_age``."""
+        removed = 0
+        cutoff = time.time() - self.max_age
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError as e:
+                logger.warning(f"Could not remove stale partial download {entry.path}: {e}")
+        return removed
+
+    async def janitor(self, interval):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.sweep)
+            except Exception as e:
+                logger.error(f"Partial download sweep failed: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self):
+        return {"resumed": self.resumed, "saved_bytes": self.saved_bytes}
+
+
+download_journal = DownloadJournal(Config.PARTIAL_DIR, Config.RESUME_MIN_BYTES, Config.PARTIAL_MAX_AGE)
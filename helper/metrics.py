@@ -0,0 +1,130 @@
+import asyncio
+import functools
+import inspect
+import logging
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from . import tracing
+
+# 0.1 s .. ~1 h: thumbnails take well under a second, big uploads tens of minutes
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 2400, 3600)
+# 64 KB/s .. 128 MB/s
+THROUGHPUT_BUCKETS = tuple(2 ** n * 64 * 1024 for n in range(0, 12))
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+STAGE_SECONDS = Histogram(
+    "autorename_stage_seconds", "Time spent per job stage", ["stage"], buckets=STAGE_BUCKETS
+)
+TRANSFER_BYTES = Counter("autorename_transfer_bytes_total", "Bytes moved to or from Telegram", ["direction"])
+TRANSFER_SPEED = Histogram(
+    "autorename_transfer_bytes_per_second", "Throughput of single transfers", ["direction"], buckets=THROUGHPUT_BUCKETS
+)
+JOBS = Counter("autorename_jobs_total", "Finished rename jobs", ["result"])
+JOBS_QUEUED = Gauge("autorename_jobs_queued", "Jobs waiting in the scheduler")
+JOBS_ACTIVE = Gauge("autorename_jobs_active", "Jobs running in the scheduler")
+SHARED_IN_FLIGHT = Gauge("autorename_shared_files_in_flight", "Shared downloads and remuxes in use")
+FFMPEG_RUNNING = Gauge("autorename_ffmpeg_running", "ffmpeg processes running")
+UPLOAD_SPEED = Histogram(
+    "autorename_upload_bytes_per_second",
+    "Throughput of parallel part uploads by parts in flight",
+    ["parallel"],
+    buckets=THROUGHPUT_BUCKETS,
+)
+UPLOAD_PART_RETRIES = Counter("autorename_upload_part_retries_total", "Upload parts sent again after an error")
+POOL_TRANSFERS = Gauge("autorename_pool_transfers", "Transfers running per client session", ["session"])
+MONGO_SECONDS = Histogram(
+    "autorename_mongo_seconds", "Latency of storage backend calls", ["method"], buckets=MONGO_BUCKETS
+)
+FLOOD_WAITS = Counter("autorename_flood_waits_total", "FloodWait errors received", ["source"])
+LOOP_LAG = Gauge("autorename_event_loop_lag_last_seconds", "Latest event loop scheduling delay")
+LOOP_LAG_SECONDS = Histogram(
+    "autorename_event_loop_lag_seconds", "Event loop scheduling delay", buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+)
+
+
+class StageTimer:
+    """Observe the duration of a ``with`` / ``async with`` block as ``stage``.
+
+    The block is also written to the trace log as a span of the current job.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.labels(self.stage).observe(self.elapsed)
+        tracing.record_since(self.stage, self.start, failed=exc[0] is not None)
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc):
+        self.__exit__(*exc)
+
+
+def record_transfer(direction, nbytes, seconds):
+    TRANSFER_BYTES.labels(direction).inc(nbytes)
+    if seconds > 0:
+        TRANSFER_SPEED.labels(direction).observe(nbytes / seconds)
+
+
+def instrument_methods(cls):
+    """Class decorator timing every public coroutine method into ``MONGO_SECONDS``."""
+    for name, func in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(func):
+            continue
+        setattr(cls, name, _timed_method(name, func))
+    return cls
+
+
+def _timed_method(name, func):
+    histogram = MONGO_SECONDS.labels(name)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+class _FloodWaitFilter(logging.Filter):
+    # pyrogram sleeps through short FloodWaits itself and only logs a warning
+    def filter(self, record):
+        if record.levelno < logging.ERROR:
+            if str(record.msg).startswith("[%s] Waiting for"):
+                FLOOD_WAITS.labels("pyrogram").inc()
+            # Keep these warnings as quiet as the "pyrogram" logger level made them
+            return False
+        return True
+
+
+def count_pyrogram_flood_waits():
+    session_log = logging.getLogger("pyrogram.session.session")
+    session_log.setLevel(logging.WARNING)
+    session_log.addFilter(_FloodWaitFilter())
+
+
+async def monitor_loop_lag(interval=0.5):
+    """Measure how late the event loop wakes a sleeping task."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_SECONDS.observe(lag)
+
+
+def render():
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+async def run_pipeline(items, stages, finalize=None, depth=1):
+    """Push ``items`` in order through ``stages``, one worker per stage.
+
+    Stage ``k`` of item ``n`` overlaps stage ``k + 1`` of item ``n - 1``, so
+    with download, remux and upload stages three files are in flight at once
+    and the queues between stages hold at most ``depth`` items. An item whose
+    stage raises skips the remaining stages. ``finalize(item, error)`` is
+    awaited once per item as it leaves the pipeline, ``error`` being the
+    exception that stopped it or ``None``.
+    """
+    queues = [asyncio.Queue(maxsize=depth) for _ in stages[1:]]
+    errors = {}
+
+    async def leave(item):
+        if finalize:
+            try:
+                await finalize(item, errors.get(id(item)))
+            except Exception as e:
+                logger.exception(f"Pipeline finalizer failed: {e}")
+
+    async def worker(stage, inbox, outbox):
+        while True:
+            item = await inbox.get() if inbox else next(source, _DONE)
+            if item is _DONE:
+                if outbox:
+                    await outbox.put(_DONE)
+                return
+            if id(item) not in errors:
+                try:
+                    await stage(item)
+                except Exception as e:
+                    errors[id(item)] = e
+            if outbox and id(item) not in errors:
+                await outbox.put(item)
+            else:
+                await leave(item)
+
+    source = iter(items)
+    inboxes = [None] + queues
+    outboxes = queues + [None]
+    workers = [
+        asyncio.create_task(worker(stage, inbox, outbox))
+        for stage, inbox, outbox in zip(stages, inboxes, outboxes)
+    ]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    return errors
+
+
+class BatchCollector:
+    """Collects items per key until none has arrived for ``window`` seconds.
+
+    ``flush(key, items)`` then receives everything collected for the key, in
+    arrival order; a batch reaching ``max_items`` is flushed at once.
+    """
+
+    def __init__(self, window, max_items, flush):
+        self.window = window
+        self.max_items = max_items
+        self.flush = flush
+        self._pending = {}
+        self._timers = {}
+        self._tasks = set()
+
+    def add(self, key, item):
+        items = self._pending.setdefault(key, [])
+        items.append(item)
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        if len(items) >= self.max_items:
+            self._flush(key)
+        else:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+
+    def pending(self, key):
+        return len(self._pending.get(key, ()))
+
+    def _flush(self, key):
+        self._timers.pop(key, None)
+        items = self._pending.pop(key, None)
+        if not items:
+            return
+        task = asyncio.create_task(self.flush(key, items))
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Batch flush failed: {task.exception()}")
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+
+from pyrogram.file_id import FileId
+
+from config import Config
+from .cache import TTLCache
+from .downloader import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Height of each named resolution; widescreen encodes are matched by width instead
+RESOLUTIONS = (
+    (2160, 3840, "4K"),
+    (1440, 2560, "1440P"),
+    (1080, 1920, "1080P"),
+    (720, 1280, "720P"),
+    (576, 1024, "576P"),
+    (480, 854, "480P"),
+    (360, 640, "360P"),
+)
+
+
+def resolution_label(width, height):
+    """``1080P`` style label in the form filename_parser produces, or None."""
+    for lines, columns, label in RESOLUTIONS:
+        if height >= lines * 0.9 or width >= columns * 0.9:
+            return label
+    return f"{height}P" if height else None
+
+
+def parse_ffprobe(output):
+    """Reduce ``ffprobe -show_format -show_streams`` JSON to what the bot uses."""
+    data = json.loads(output)
+    streams = data.get("streams", [])
+    if not streams:
+        # ffprobe prints "{}" when it could not read the container
+        raise ValueError("no streams found")
+    duration = float(data.get("format", {}).get("duration") or 0)
+    if not duration:
+        duration = max((float(s.get("duration") or 0) for s in streams), default=0)
+    video = next(
+        (s for s in streams if s.get("codec_type") == "video" and not s.get("disposition", {}).get("attached_pic")),
+        None,
+    )
+    width = int(video.get("width") or 0) if video else 0
+    height = int(video.get("height") or 0) if video else 0
+    return {
+        "duration": int(round(duration)),
+        "width": width,
+        "height": height,
+        "resolution": resolution_label(width, height) if video else None,
+        "video_codec": video.get("codec_name") if video else None,
+        "audio_codecs": [s.get("codec_name") for s in streams if s.get("codec_type") == "audio"],
+        "tracks": [
+            {
+                "type": s.get("codec_type"),
+                "codec": s.get("codec_name"),
+                "language": s.get("tags", {}).get("language"),
+            }
+            for s in streams
+        ],
+    }
+
+
+class MediaProbe:
+    """Duration, dimensions, codecs and tracks of a file from its container headers.
+
+    ffprobe reads a local file's headers and stops, or is fed just the first
+    ``head_bytes`` of a Telegram file, which is enough for MKV, WebM and
+    faststart MP4 and lets ``{resolution}`` be filled before the download
+    starts. It runs as a subprocess, so the event loop is never blocked.
+    Complete results are cached by ``file_unique_id``.
+    """
+
+    def __init__(self, head_bytes, timeout, cache_size, cache_ttl):
+        self.head_bytes = head_bytes
+        self.timeout = timeout
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    async def _ffprobe(self, source, data=None):
+        args = ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams"]
+        if data is not None:
+            args += ["-probesize", str(len(data))]
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args, source,
+                stdin=asyncio.subprocess.PIPE if data is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            logger.warning("ffprobe is not installed; media probing is disabled")
+            return None
+        try:
+            # communicate() ignores the broken pipe when ffprobe stops reading early
+            stdout, stderr = await asyncio.wait_for(process.communicate(data), self.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            logger.warning(f"ffprobe timed out on {source}")
+            return None
+        try:
+            return parse_ffprobe(stdout)
+        except ValueError:
+            logger.warning(f"ffprobe failed on {source}: {stderr.decode(errors='replace')[-300:]}")
+            return None
+
+    async def probe_message(self, client, message):
+        """Probe a Telegram file from its first ``head_bytes``; may lack the duration."""
+        media = message.document or message.video or message.audio
+        info = self._cache.get(media.file_unique_id)
+        if info is not None:
+            return info
+        head = bytearray()
+        try:
+            async for chunk in client.get_file(
+                FileId.decode(media.file_id), media.file_size, limit=max(1, self.head_bytes // CHUNK_SIZE)
+            ):
+                head += chunk
+        except Exception as e:
+            logger.warning(f"Could not fetch the head of {media.file_unique_id}: {e}")
+        if not head:
+            return None
+        info = await self._ffprobe("pipe:0", bytes(head))
+        # Without a duration the index is further in; probe_file gets it after the download
+        if info and info["duration"]:
+            self._cache.set(media.file_unique_id, info)
+        return info
+
+    async def probe_file(self, unique_id, path):
+        info = self._cache.get(unique_id)
+        if info is None:
+            info = await self._ffprobe(path)
+            if info:
+                self._cache.set(unique_id, info)
+        return info
+
+    def cached(self, unique_id):
+        """A probe result still in the cache, without counting a lookup."""
+        return self._cache.peek(unique_id)
+
+    def stats(self):
+        return self._cache.stats()
+
+
+media_probe = MediaProbe(Config.PROBE_HEAD_BYTES, Config.PROBE_TIMEOUT, Config.PROBE_CACHE_SIZE, Config.PROBE_CACHE_TTL)
@@ -0,0 +1,126 @@
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+
+class SamplingProfiler:
+    """Samples the stack of every thread at a fixed interval.
+
+    Cheap enough to run in production: a daemon thread reads
+    ``sys._current_frames()`` every ``interval`` seconds and counts stacks,
+    so time in the event loop, the thumbnail pool or waiting in ``select``
+    (Telegram I/O, ffmpeg, Mongo) shows up in proportion to how long it lasts.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Stacks in the folded format read by flamegraph.pl and speedscope."""
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+
+    def summary(self, limit=30):
+        """Functions by the share of samples they were on the stack (inclusive) or on top (self)."""
+        inclusive, own = collections.Counter(), collections.Counter()
+        for stack, count in self._stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        total = sum(self._stacks.values()) or 1
+        lines = [f"{self.samples} samples every {self.interval * 1000:.0f} ms", "", "self %   function"]
+        lines += [f"{count * 100 / total:6.2f}  {frame}" for frame, count in own.most_common(limit)]
+        lines += ["", "total %  function"]
+        lines += [f"{count * 100 / total:6.2f}  {frame}" for frame, count in inclusive.most_common(limit)]
+        return "\n".join(lines)
+
+
+def memory_report(before, after, limit=30):
+    lines = ["Top allocations by line", ""]
+    lines += [str(stat) for stat in after.statistics("lineno")[:limit]]
+    lines += ["", "Largest growth during the run", ""]
+    lines += [str(stat) for stat in after.compare_to(before, "lineno")[:limit]]
+    current, peak = tracemalloc.get_traced_memory()
+    lines += ["", f"traced: {current / 2**20:.1f} MiB now, {peak / 2**20:.1f} MiB peak"]
+    return "\n".join(lines)
+
+
+_lock = asyncio.Lock()
+
+
+def running():
+    return _lock.locked()
+
+
+def _write_reports(paths, reports):
+    for path, text in zip(paths, reports):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+async def profile(seconds, directory, interval=0.005):
+    """Profile the whole process for ``seconds`` and write the reports into ``directory``.
+
+    Returns the paths of the CPU summary, the folded stacks and the memory report.
+    """
+    loop = asyncio.get_running_loop()
+    async with _lock:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(10)
+        # Snapshots and their comparison walk every traced block; keep them off the loop
+        before = await loop.run_in_executor(None, tracemalloc.take_snapshot)
+        sampler = SamplingProfiler(interval)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+            after = await loop.run_in_executor(None, tracemalloc.take_snapshot)
+            memory = await loop.run_in_executor(None, memory_report, before, after)
+            if started_tracing:
+                tracemalloc.stop()
+
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    paths = (
+        os.path.join(directory, f"cpu-{stamp}.txt"),
+        os.path.join(directory, f"cpu-{stamp}.folded"),
+        os.path.join(directory, f"memory-{stamp}.txt"),
+    )
+    reports = (sampler.summary(), sampler.collapsed(), memory)
+    await loop.run_in_executor(None, _write_reports, paths, reports)
+    return paths
@@ -0,0 +1,47 @@
+import os
+
+from .ffmpeg import ffmpeg_pool
+
+# Containers ffmpeg can demux from a non-seekable pipe. MP4/MOV are missing on
+# purpose: their index (moov atom) is usually at the end of the file.
+STREAMABLE_EXTENSIONS = {".mkv", ".mka", ".webm", ".ts", ".m2ts", ".mpg", ".mpeg", ".flv", ".mp3", ".aac", ".flac", ".ogg", ".opus"}
+
+
+def can_stream(file_name):
+    return os.path.splitext(file_name)[1].lower() in STREAMABLE_EXTENSIONS
+
+
+def metadata_args(metadata):
+    return [
+        "-map", "0", "-c:s", "copy", "-c:a", "copy", "-c:v", "copy",
+        "-metadata", f"title={metadata}", "-metadata", f"author={metadata}",
+        "-metadata:s:s", f"title={metadata}", "-metadata:s:a", f"title={metadata}",
+        "-metadata:s:v", f"title={metadata}",
+    ]
+
+
+async def stream_remux(client, message, output_path, metadata, progress=None):
+    """Pipe the Telegram download straight into ffmpeg and write only the remuxed file.
+
+    Returns ``(True, "")`` on success or ``(False, stderr_tail)`` when ffmpeg fails,
+    in which case the partial output has already been removed.
+    """
+    media = message.document or message.video or message.audio
+    return await ffmpeg_pool.run(
+        ["-i", "pipe:0", *metadata_args(metadata)],
+        output_path,
+        feed=client.stream_media(message),
+        total=media.file_size,
+        progress=progress,
+    )
+
+
+async def remux_file(input_path, output_path, metadata, duration=0, progress=None):
+    """Copy every stream of ``input_path`` into ``output_path`` with the metadata tags set."""
+    return await ffmpeg_pool.run(
+        ["-i", input_path, *metadata_args(metadata)],
+        output_path,
+        total=os.path.getsize(input_path),
+        duration=duration,
+        progress=progress,
+    )
@@ -0,0 +1,55 @@
+import hashlib
+
+from config import Config
+from .cache import TTLCache
+from .database import AshutoshGoswami24
+
+
+class ResultCache:
+    """Maps a rename job's inputs to the file_id of the file we already uploaded for them.
+
+    Lookups go through an in-process TTL cache first and then the ``results``
+    collection, so hits survive restarts and are shared between users.
+    """
+
+    def __init__(self, db, ttl, maxsize):
+        self.db = db
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(file_unique_id, file_name, metadata, thumb_id, media_type):
+        raw = "\x1f".join(str(part or "") for part in (file_unique_id, file_name, metadata, thumb_id, media_type))
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    async def get(self, key):
+        file_id = self._memory.get(key)
+        if file_id is None:
+            file_id = await self.db.get_cached_result(key)
+            if file_id:
+                self._memory.set(key, file_id)
+        if file_id:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return file_id
+
+    async def put(self, key, file_id):
+        self._memory.set(key, file_id)
+        await self.db.set_cached_result(key, file_id)
+
+    async def invalidate(self, key):
+        self._memory.pop(key)
+        await self.db.delete_cached_result(key)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+result_cache = ResultCache(AshutoshGoswami24, ttl=Config.RESULT_CACHE_TTL, maxsize=Config.RESULT_CACHE_SIZE)
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+
+from config import Config
+from .metrics import JOBS_QUEUED, JOBS_ACTIVE
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, user_id, func, on_start=None):
+        self.user_id = user_id
+        self.func = func
+        self.on_start = on_start
+        self.future = asyncio.get_running_loop().create_future()
+        # Most jobs are fire-and-forget; failures are already logged by the scheduler
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.started = False
+
+    def __await__(self):
+        return self.future.__await__()
+
+
+class JobScheduler:
+    """Runs jobs with a global and a per-user concurrency cap.
+
+    Pending jobs are kept in one FIFO per user and users are served
+    round-robin, so a user forwarding a hundred files only gets one turn
+    per round like everyone else. Stage semaphores (``network``) bound
+    the expensive parts of a job independently of the job count; ffmpeg
+    has its own pool in ``helper.ffmpeg``.
+    """
+
+    def __init__(self, max_jobs, per_user, max_queued_per_user, stage_limits):
+        self.max_jobs = max_jobs
+        self.per_user = per_user
+        self.max_queued_per_user = max_queued_per_user
+        self._stage_limits = dict(stage_limits)
+        self._stages = {}
+        self._queues = {}
+        self._ready = deque()
+        self._running = {}
+        self._active = 0
+        self._tasks = set()
+
+    @property
+    def queued(self):
+        return sum(len(q) for q in self._queues.values())
+
+    @property
+    def active(self):
+        return self._active
+
+    def user_queued(self, user_id):
+        return len(self._queues.get(user_id, ()))
+
+    def submit(self, user_id, func, on_start=None):
+        """Queue ``func`` (a coroutine function) for ``user_id`` and return its Job."""
+        queue = self._queues.get(user_id)
+        if queue is not None and len(queue) >= self.max_queued_per_user:
+            raise QueueFull(f"user {user_id} already has {len(queue)} queued jobs")
+        job = Job(user_id, func, on_start)
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._ready.append(user_id)
+        queue.append(job)
+        self._dispatch()
+        return job
+
+    def position(self, job):
+        """Approximate place of a pending job in the round-robin order (1-based), 0 once started."""
+        if job.started:
+            return 0
+        queue = self._queues.get(job.user_id)
+        if not queue:
+            return 0
+        try:
+            rank = queue.index(job)
+        except ValueError:
+            return 0
+        ahead = sum(min(len(q), rank + 1) for uid, q in self._queues.items() if uid != job.user_id)
+        return ahead + rank + 1
+
+    @asynccontextmanager
+    async def stage(self, name):
+        sem = self._stages.get(name)
+        if sem is None:
+            sem = self._stages[name] = asyncio.Semaphore(self._stage_limits.get(name, self.max_jobs))
+        async with sem:
+            yield
+
+    def _dispatch(self):
+        # Each pass over the ready ring gives every waiting user at most one slot
+        skipped = 0
+        while self._active < self.max_jobs and self._ready and skipped < len(self._ready):
+            user_id = self._ready[0]
+            self._ready.rotate(-1)
+            if self._running.get(user_id, 0) >= self.per_user:
+                skipped += 1
+                continue
+            skipped = 0
+            queue = self._queues[user_id]
+            job = queue.popleft()
+            if not queue:
+                del self._queues[user_id]
+                self._ready.remove(user_id)
+            self._start(job)
+
+    def _start(self, job):
+        job.started = True
+        self._active += 1
+        self._running[job.user_id] = self._running.get(job.user_id, 0) + 1
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job):
+        try:
+            if job.on_start:
+                try:
+                    await job.on_start()
+                except Exception as e:
+                    # Only cosmetic (it deletes the "Queued" notice); never fail the job for it
+                    logger.warning(f"on_start for user {job.user_id} failed: {e}")
+            result = await job.func()
+        except asyncio.CancelledError:
+            # Whoever awaits the job must not hang on a future nobody will resolve
+            job.future.cancel()
+            raise
+        except Exception as e:
+            logger.exception(f"Job for user {job.user_id} failed: {e}")
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._active -= 1
+            self._running[job.user_id] -= 1
+            if not self._running[job.user_id]:
+                del self._running[job.user_id]
+            self._dispatch()
+
+
+rename_scheduler = JobScheduler(
+    max_jobs=Config.MAX_CONCURRENT_JOBS,
+    per_user=Config.MAX_JOBS_PER_USER,
+    max_queued_per_user=Config.MAX_QUEUED_PER_USER,
+    stage_limits={
+        "network": Config.NETWORK_CONCURRENCY,
+    },
+)
+JOBS_QUEUED.set_function(lambda: rename_scheduler.queued)
+JOBS_ACTIVE.set_function(lambda: rename_scheduler.active)
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from .metrics import SHARED_IN_FLIGHT
+from .workspace import workspaces
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ("task", "refs")
+
+    def __init__(self, task):
+        self.task = task
+        self.refs = 0
+
+
+class SharedFiles:
+    """Single-flight producer of on-disk artifacts shared by concurrent jobs.
+
+    The first job asking for a key runs the producer; every other job asking
+    while it is in flight (or still in use) waits for the same result. The
+    file is reference counted and deleted when the last job releases it.
+    A failed producer is forgotten at once so later jobs can retry.
+    """
+
+    def __init__(self, discard=os.remove):
+        self.discard = discard
+        self._flights = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def in_flight(self, key):
+        return key in self._flights
+
+    @asynccontextmanager
+    async def acquire(self, key, producer):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.create_task(producer()))
+            flight.task.add_done_callback(lambda task: self._forget_failed(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        flight.refs += 1
+        try:
+            # shield: one waiter giving up must not cancel the others' download
+            yield await asyncio.shield(flight.task)
+        finally:
+            flight.refs -= 1
+            if not flight.refs:
+                self._release(key, flight)
+
+    def _forget_failed(self, key, flight):
+        if (flight.task.cancelled() or flight.task.exception()) and self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _release(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.done():
+            flight.task.cancel()
+        elif not flight.task.cancelled() and not flight.task.exception():
+            path = flight.task.result()
+            if path and os.path.exists(path):
+                try:
+                    self.discard(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove shared file {path}: {e}")
+
+    def stats(self):
+        return {"in_flight": len(self._flights), "started": self.started, "coalesced": self.coalesced}
+
+
+# Shared files are produced in their own workspace, removed with the file
+shared_files = SharedFiles(discard=workspaces.discard)
+SHARED_IN_FLIGHT.set_function(lambda: len(shared_files._flights))
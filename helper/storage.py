@@ -0,0 +1,314 @@
+import asyncio
+import datetime
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from .metrics import instrument_methods
+
+
+class Storage(ABC):
+    """What ``Database`` needs from a backend.
+
+    Users are documents keyed by integer ``_id``; ``set_user_field`` only
+    touches existing users, ``insert_user`` never overwrites one.
+    """
+
+    name = "storage"
+
+    @abstractmethod
+    async def ping(self):
+        ...
+
+    @abstractmethod
+    async def ensure_indexes(self):
+        ...
+
+    @abstractmethod
+    async def get_user(self, user_id, fields):
+        """The user's document restricted to ``fields``, or None."""
+
+    @abstractmethod
+    async def set_user_field(self, user_id, field, value):
+        """Set one field of an existing user; True if the user exists."""
+
+    @abstractmethod
+    async def insert_user(self, user_id, defaults):
+        """Create the user with ``defaults`` unless it exists; True if it was created."""
+
+    @abstractmethod
+    async def count_users(self, estimated=False):
+        ...
+
+    @abstractmethod
+    def find_users(self, batch_size):
+        """Async iterable of ``{"_id": user_id}`` for every user."""
+
+    @abstractmethod
+    async def user_ids_after(self, after_id, limit):
+        ...
+
+    @abstractmethod
+    async def delete_users(self, user_ids):
+        """Delete the given users and return how many existed."""
+
+    @abstractmethod
+    async def save_broadcast(self, state):
+        ...
+
+    @abstractmethod
+    async def unfinished_broadcasts(self):
+        ...
+
+    @abstractmethod
+    async def get_result(self, key):
+        ...
+
+    @abstractmethod
+    async def set_result(self, key, file_id):
+        ...
+
+    @abstractmethod
+    async def delete_result(self, key):
+        ...
+
+
+@instrument_methods
+class MongoStorage(Storage):
+    name = "MongoDB"
+
+    def __init__(self, uri, database_name):
+        # Imported here so SQLite deployments never load Motor
+        import motor.motor_asyncio
+
+        # Motor connects lazily; ping() verifies the server at startup
+        self._client = motor.motor_asyncio.AsyncIOMotorClient(
+            uri,
+            serverSelectionTimeoutMS=Config.DB_CONNECT_TIMEOUT * 1000,
+            maxPoolSize=Config.DB_POOL_SIZE,
+            compressors=Config.DB_COMPRESSORS or None,
+        )
+        self.db = self._client[database_name]
+        self.col = self.db.user
+        self.broadcasts = self.db.broadcasts
+        self.results = self.db.results
+
+    async def ping(self):
+        await self._client.admin.command("ping")
+
+    async def ensure_indexes(self):
+        await self.broadcasts.create_index("status")
+        # Old upload results expire on their own instead of growing forever
+        await self.results.create_index("updated", expireAfterSeconds=Config.RESULT_STORE_TTL)
+
+    async def get_user(self, user_id, fields):
+        return await self.col.find_one({"_id": user_id}, projection={field: 1 for field in fields} or {"_id": 1})
+
+    async def set_user_field(self, user_id, field, value):
+        result = await self.col.update_one({"_id": user_id}, {"$set": {field: value}})
+        return result.matched_count > 0
+
+    async def insert_user(self, user_id, defaults):
+        # One round trip: only a new user gets the defaults written
+        result = await self.col.update_one({"_id": user_id}, {"$setOnInsert": defaults}, upsert=True)
+        return result.upserted_id is not None
+
+    async def count_users(self, estimated=False):
+        if estimated:
+            return await self.col.estimated_document_count()
+        return await self.col.count_documents({})
+
+    def find_users(self, batch_size):
+        return self.col.find({}, projection={"_id": 1}, batch_size=batch_size)
+
+    async def user_ids_after(self, after_id, limit):
+        query = {"_id": {"$gt": after_id}} if after_id is not None else {}
+        cursor = self.col.find(query, projection={"_id": 1}, batch_size=limit).sort("_id", 1).limit(limit)
+        return [user["_id"] async for user in cursor]
+
+    async def delete_users(self, user_ids):
+        result = await self.col.delete_many({"_id": {"$in": user_ids}})
+        return result.deleted_count
+
+    async def save_broadcast(self, state):
+        await self.broadcasts.replace_one({"_id": state["_id"]}, state, upsert=True)
+
+    async def unfinished_broadcasts(self):
+        return [b async for b in self.broadcasts.find({"status": "running"})]
+
+    async def get_result(self, key):
+        result = await self.results.find_one({"_id": key}, projection={"file_id": 1})
+        return result["file_id"] if result else None
+
+    async def set_result(self, key, file_id):
+        await self.results.update_one(
+            {"_id": key},
+            {"$set": {"file_id": file_id, "updated": datetime.datetime.utcnow()}},
+            upsert=True,
+        )
+
+    async def delete_result(self, key):
+        await self.results.delete_one({"_id": key})
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS broadcasts (id TEXT PRIMARY KEY, status TEXT NOT NULL, doc TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS broadcasts_status ON broadcasts (status);
+CREATE TABLE IF NOT EXISTS results (id TEXT PRIMARY KEY, file_id TEXT NOT NULL, updated REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS results_updated ON results (updated);
+"""
+
+
+@instrument_methods
+class SQLiteStorage(Storage):
+    """Embedded storage in one SQLite file, for single-node deployments and offline tests.
+
+    Documents are stored as JSON so every field round-trips exactly as with
+    MongoDB. The connection lives on one dedicated thread: queries never block
+    the event loop and need no locking. WAL mode lets readers run during writes.
+    """
+
+    name = "SQLite"
+
+    def __init__(self, path):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, func, *args):
+        def call():
+            return func(self._connect(), *args)
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    async def ping(self):
+        await self._run(lambda conn: conn.execute("SELECT 1").fetchone())
+
+    async def ensure_indexes(self):
+        # Indexes come with the schema; expire old results like Mongo's TTL index
+        cutoff = time.time() - Config.RESULT_STORE_TTL
+        await self._run(lambda conn: conn.execute("DELETE FROM results WHERE updated < ?", (cutoff,)))
+
+    @staticmethod
+    def _load_user(conn, user_id):
+        row = conn.execute("SELECT doc FROM users WHERE id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def get_user(self, user_id, fields):
+        def get(conn):
+            doc = self._load_user(conn, user_id)
+            if doc is None:
+                return None
+            return {k: v for k, v in doc.items() if k in fields or k == "_id"}
+
+        return await self._run(get)
+
+    async def set_user_field(self, user_id, field, value):
+        def update(conn):
+            doc = self._load_user(conn, user_id)
+            if doc is None:
+                return False
+            doc[field] = value
+            conn.execute("UPDATE users SET doc = ? WHERE id = ?", (json.dumps(doc), user_id))
+            return True
+
+        return await self._run(update)
+
+    async def insert_user(self, user_id, defaults):
+        doc = json.dumps(dict(defaults, _id=user_id))
+        cursor = await self._run(
+            lambda conn: conn.execute("INSERT OR IGNORE INTO users (id, doc) VALUES (?, ?)", (user_id, doc))
+        )
+        return cursor.rowcount == 1
+
+    async def count_users(self, estimated=False):
+        return await self._run(lambda conn: conn.execute("SELECT COUNT(*) FROM users").fetchone()[0])
+
+    async def find_users(self, batch_size):
+        after_id = None
+        while True:
+            user_ids = await self.user_ids_after(after_id, batch_size)
+            for user_id in user_ids:
+                yield {"_id": user_id}
+            if len(user_ids) < batch_size:
+                return
+            after_id = user_ids[-1]
+
+    async def user_ids_after(self, after_id, limit):
+        def select(conn):
+            if after_id is None:
+                rows = conn.execute("SELECT id FROM users ORDER BY id LIMIT ?", (limit,))
+            else:
+                rows = conn.execute("SELECT id FROM users WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))
+            return [row[0] for row in rows]
+
+        return await self._run(select)
+
+    async def delete_users(self, user_ids):
+        def delete(conn):
+            placeholders = ",".join("?" * len(user_ids))
+            return conn.execute(f"DELETE FROM users WHERE id IN ({placeholders})", user_ids).rowcount
+
+        return await self._run(delete)
+
+    async def save_broadcast(self, state):
+        doc = json.dumps(state)
+        await self._run(
+            lambda conn: conn.execute(
+                "INSERT OR REPLACE INTO broadcasts (id, status, doc) VALUES (?, ?, ?)",
+                (state["_id"], state["status"], doc),
+            )
+        )
+
+    async def unfinished_broadcasts(self):
+        def select(conn):
+            rows = conn.execute("SELECT doc FROM broadcasts WHERE status = 'running'")
+            return [json.loads(row[0]) for row in rows]
+
+        return await self._run(select)
+
+    async def get_result(self, key):
+        cutoff = time.time() - Config.RESULT_STORE_TTL
+        row = await self._run(
+            lambda conn: conn.execute(
+                "SELECT file_id FROM results WHERE id = ? AND updated >= ?", (key, cutoff)
+            ).fetchone()
+        )
+        return row[0] if row else None
+
+    async def set_result(self, key, file_id):
+        await self._run(
+            lambda conn: conn.execute(
+                "INSERT OR REPLACE INTO results (id, file_id, updated) VALUES (?, ?, ?)",
+                (key, file_id, time.time()),
+            )
+        )
+
+    async def delete_result(self, key):
+        await self._run(lambda conn: conn.execute("DELETE FROM results WHERE id = ?", (key,)))
+
+
+def create_storage():
+    """The backend selected by ``Config.DB_BACKEND``: "mongo" (default) or "sqlite"."""
+    backend = Config.DB_BACKEND.lower()
+    if backend == "sqlite":
+        return SQLiteStorage(Config.SQLITE_PATH)
+    if backend == "mongo":
+        return MongoStorage(Config.DB_URL, Config.DB_NAME)
+    raise ValueError(f"Unknown DB_BACKEND {Config.DB_BACKEND!r}, expected 'mongo' or 'sqlite'")
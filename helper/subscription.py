@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.errors import UserNotParticipant
+
+from config import Config
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+NOT_MEMBER = {ChatMemberStatus.BANNED, ChatMemberStatus.LEFT}
+
+
+class MembershipChecker:
+    """Force-subscription check with a per-user cache of the channels still to join.
+
+    Members are cached for ``positive_ttl`` seconds, users missing a channel
+    for the shorter ``negative_ttl`` so they are let in soon after joining.
+    All channels are checked concurrently.
+    """
+
+    def __init__(self, channels, positive_ttl, negative_ttl, maxsize=50000):
+        self.channels = [c.strip() for c in channels if c.strip()]
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._peers = {}
+        self._cache = TTLCache(maxsize=maxsize, ttl=positive_ttl)
+        self._latencies = deque(maxlen=500)
+
+    async def resolve(self, client):
+        """Resolve channel usernames to ids once, so checks skip the username lookup."""
+        await asyncio.gather(*(self._resolve(client, channel) for channel in self.channels))
+
+    async def _resolve(self, client, channel):
+        try:
+            chat = await client.get_chat(channel)
+            self._peers[channel] = chat.id
+        except Exception as e:
+            logger.warning(f"Could not resolve force-sub channel {channel}: {e}")
+
+    async def _is_member(self, client, channel, user_id):
+        try:
+            member = await client.get_chat_member(self._peers.get(channel, channel), user_id)
+            return member.status not in NOT_MEMBER
+        except UserNotParticipant:
+            return False
+        except Exception as e:
+            # Misconfigured channel (bot not admin, renamed...): don't lock users out
+            logger.warning(f"Force-sub check failed for {channel}: {e}")
+            return True
+
+    async def not_joined(self, client, user_id):
+        """Return the channels ``user_id`` still has to join."""
+        if not self.channels:
+            return []
+        cached = self._cache.get(user_id)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(self._is_member(client, channel, user_id) for channel in self.channels)
+        )
+        self._latencies.append(time.perf_counter() - start)
+        missing = [c for c, joined in zip(self.channels, results) if not joined]
+        self._cache.set(user_id, missing, ttl=self.negative_ttl if missing else self.positive_ttl)
+        return missing
+
+    def cached(self, user_id):
+        """The channels last found missing for ``user_id``, without counting a lookup."""
+        return self._cache.peek(user_id)
+
+    def invalidate(self, user_id):
+        self._cache.pop(user_id)
+
+    def stats(self):
+        stats = self._cache.stats()
+        latencies = sorted(self._latencies)
+        if latencies:
+            stats["avg_ms"] = round(sum(latencies) / len(latencies) * 1000, 1)
+            stats["p95_ms"] = round(latencies[int(len(latencies) * 0.95)] * 1000, 1)
+        else:
+            stats["avg_ms"] = stats["p95_ms"] = 0.0
+        return stats
+
+
+membership = MembershipChecker(
+    Config.FORCE_SUB_CHANNELS,
+    positive_ttl=Config.FORCE_SUB_POSITIVE_TTL,
+    negative_ttl=Config.FORCE_SUB_NEGATIVE_TTL,
+)
@@ -0,0 +1,127 @@
+import re
+from functools import lru_cache
+
+FILENAME_FIELDS = ("title", "season", "episode", "resolution", "audio", "codec", "audio_codec", "group")
+CAPTION_FIELDS = ("filename", "filesize", "duration")
+
+# Keywords documented in Txt.FILE_NAME_TXT for /autorename
+_LEGACY_ALIASES = {"[episode]": "{episode}", "[quality]": "{resolution}"}
+
+_TOKEN_RE = re.compile(r"\{\{|\}\}|\{(\w*)\}|[\[\]()]|[^{}\[\]()]+|[{}]")
+_CLOSING = {"[": "]", "(": ")"}
+
+_LITERAL, _FIELD, _GROUP = 0, 1, 2
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class Template:
+    """A filename or caption template parsed once into literal and placeholder parts.
+
+    A ``[...]`` or ``(...)`` segment that contains placeholders is conditional:
+    it is left out entirely when all of its placeholders render empty, so
+    ``{title} [{audio}]`` gives ``Title`` rather than ``Title []``.
+    Unknown placeholders are kept verbatim and listed in ``unknown``.
+    """
+
+    def __init__(self, source, fields, collapse_spaces=False):
+        self.source = source
+        self.fields = frozenset(fields)
+        self.collapse_spaces = collapse_spaces
+        self.unknown = []
+        self._parts = self._compile(source)
+
+    def _compile(self, source):
+        parts, group, opener = [], None, None
+        for match in _TOKEN_RE.finditer(source):
+            token, name = match.group(0), match.group(1)
+            target = group if group is not None else parts
+            if token in ("{{", "}}"):
+                target.append((_LITERAL, token[0]))
+            elif name is not None:
+                if name in self.fields:
+                    target.append((_FIELD, name))
+                else:
+                    if name not in self.unknown:
+                        self.unknown.append(name)
+                    target.append((_LITERAL, token))
+            elif token in _CLOSING and group is None:
+                group, opener = [(_LITERAL, token)], token
+            elif group is not None and token == _CLOSING[opener]:
+                group.append((_LITERAL, token))
+                parts.extend(self._close(group))
+                group = None
+            else:
+                target.append((_LITERAL, token))
+        if group is not None:
+            parts.extend(group)
+        return self._merge(parts)
+
+    def _close(self, group):
+        if any(kind == _FIELD for kind, _ in group):
+            return [(_GROUP, self._merge(group))]
+        return group
+
+    @staticmethod
+    def _merge(parts):
+        merged = []
+        for kind, value in parts:
+            if kind == _LITERAL and merged and merged[-1][0] == _LITERAL:
+                merged[-1] = (_LITERAL, merged[-1][1] + value)
+            else:
+                merged.append((kind, value))
+        return merged
+
+    def uses(self, name):
+        """Whether the placeholder ``name`` appears anywhere in the template."""
+        return any(
+            value == name if kind == _FIELD else kind == _GROUP and (_FIELD, name) in value
+            for kind, value in self._parts
+        )
+
+    def render(self, values=None, **kwargs):
+        if kwargs:
+            values = dict(values or {}, **kwargs)
+        out = []
+        for kind, value in self._parts:
+            if kind == _LITERAL:
+                out.append(value)
+            elif kind == _FIELD:
+                out.append(str(values.get(value) or ""))
+            else:
+                rendered = [
+                    v if k == _LITERAL else str(values.get(v) or "") for k, v in value
+                ]
+                if any(rendered[i] for i, (k, _) in enumerate(value) if k == _FIELD):
+                    out.extend(rendered)
+        result = "".join(out)
+        if self.collapse_spaces:
+            result = " ".join(result.split())
+        return result
+
+
+def _apply_aliases(source):
+    for legacy, placeholder in _LEGACY_ALIASES.items():
+        source = source.replace(legacy, placeholder)
+    return source
+
+
+@lru_cache(maxsize=4096)
+def filename_template(source):
+    return Template(_apply_aliases(source), FILENAME_FIELDS, collapse_spaces=True)
+
+
+@lru_cache(maxsize=4096)
+def caption_template(source):
+    return Template(source, CAPTION_FIELDS)
+
+
+def validate(template):
+    """Raise TemplateError if the template uses placeholders it cannot fill."""
+    if template.unknown:
+        allowed = ", ".join(f"{{{f}}}" for f in sorted(template.fields))
+        unknown = ", ".join(f"{{{f}}}" for f in template.unknown)
+        raise TemplateError(f"Unknown placeholder(s) {unknown}. Available: {allowed}")
+    return template
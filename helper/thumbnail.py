@@ -0,0 +1,171 @@
+import asyncio
+import io
+import logging
+import os
+import shutil
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pyrogram.file_id import FileId, FileUniqueId, FileUniqueType
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+THUMB_SIZE = (320, 320)
+# Telegram rejects thumbnails above 200 KB
+THUMB_MAX_BYTES = 200 * 1024
+
+_thumb_pool = ThreadPoolExecutor(max_workers=Config.THUMB_WORKERS, thread_name_prefix="thumb")
+
+
+def thumb_unique_id(file_id):
+    """Derive the file_unique_id of a stored thumbnail from its file_id."""
+    try:
+        decoded = FileId.decode(file_id)
+    except Exception:
+        return file_id
+    # Photos and documents share the DOCUMENT unique type, keyed by media id
+    return FileUniqueId(
+        file_unique_type=FileUniqueType.DOCUMENT, media_id=decoded.media_id
+    ).encode()
+
+
+def _encode_jpeg(img, max_bytes):
+    # Binary search for the highest quality that still fits in max_bytes
+    low, high, best = 30, 95, None
+    while low <= high:
+        quality = (low + high) // 2
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=quality, optimize=True)
+        if buf.tell() <= max_bytes:
+            best, low = buf, quality + 1
+        else:
+            high = quality - 1
+    if best is None:
+        best = io.BytesIO()
+        img.save(best, "JPEG", quality=30, optimize=True)
+    return best.getvalue()
+
+
+def render_thumbnail(path, size=THUMB_SIZE, max_bytes=THUMB_MAX_BYTES):
+    """Shrink the image at ``path`` in place to a JPEG that Telegram accepts as a thumbnail."""
+    # Imported on first use (on the thumbnail pool) to keep PIL out of startup
+    from PIL import Image
+
+    with Image.open(path) as img:
+        # JPEG draft mode lets libjpeg decode at 1/2, 1/4 or 1/8 scale directly
+        img.draft("RGB", size)
+        img = img.convert("RGB")
+        img.thumbnail(size, Image.LANCZOS, reducing_gap=2.0)
+    data = _encode_jpeg(img, max_bytes)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+async def process_thumbnail(path):
+    """Run ``render_thumbnail`` on the thumbnail pool so the event loop stays responsive."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_thumb_pool, render_thumbnail, path)
+
+
+class ThumbnailCache:
+    """On-disk cache of processed 320x320 JPEG thumbnails, evicted LRU by total bytes.
+
+    Entries handed out by ``get``/``put`` are pinned until ``release`` so an
+    eviction never deletes a thumbnail an upload is still reading.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pins = {}
+        self._bytes = 0
+        # Rebuild the index from a previous run, oldest first
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".jpg") and os.path.isfile(path):
+                files.append((os.path.getmtime(path), name[:-4], os.path.getsize(path)))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._bytes += size
+        self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.jpg")
+
+    def get(self, key):
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            self._bytes -= self._entries.pop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._pins[key] = self._pins.get(key, 0) + 1
+        self.hits += 1
+        return path
+
+    def put(self, key, src_path):
+        """Move a processed thumbnail into the cache and return its pinned cached path."""
+        path = self._path(key)
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)
+        shutil.move(src_path, path)
+        size = os.path.getsize(path)
+        self._entries[key] = size
+        self._bytes += size
+        self._pins[key] = self._pins.get(key, 0) + 1
+        self._evict()
+        return path
+
+    def release(self, key):
+        pins = self._pins.get(key, 0) - 1
+        if pins > 0:
+            self._pins[key] = pins
+        else:
+            self._pins.pop(key, None)
+        self._evict()
+
+    def invalidate(self, key):
+        if key in self._entries and key not in self._pins:
+            self._bytes -= self._entries.pop(key)
+            self._remove(key)
+
+    def _evict(self):
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            if key in self._pins:
+                continue
+            self._bytes -= self._entries.pop(key)
+            self._remove(key)
+
+    def _remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove cached thumbnail {key}: {e}")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+thumb_cache = ThumbnailCache(Config.THUMB_CACHE_DIR, Config.THUMB_CACHE_BYTES)
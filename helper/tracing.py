@@ -0,0 +1,67 @@
+import contextvars
+import json
+import logging
+import os
+import time
+from logging.handlers import RotatingFileHandler
+
+from config import Config
+
+# (user_id, message_id) of the job the running code works for
+current_job = contextvars.ContextVar("current_job", default=None)
+
+
+class _TraceFileHandler(RotatingFileHandler):
+    """Rotating file of Chrome trace events.
+
+    Each file starts with ``[`` and every event ends with ``,``; the trace
+    event format allows the closing ``]`` to be missing, so any file, even
+    the one being written, loads in chrome://tracing or ui.perfetto.dev.
+    """
+
+    def _open(self):
+        stream = super()._open()
+        if stream.tell() == 0:
+            stream.write("[\n")
+        return stream
+
+
+trace_log = logging.getLogger("autorename.trace")
+trace_log.propagate = False
+trace_log.setLevel(logging.INFO)
+if Config.TRACE_LOG:
+    os.makedirs(os.path.dirname(os.path.abspath(Config.TRACE_LOG)), exist_ok=True)
+    _handler = _TraceFileHandler(
+        Config.TRACE_LOG, maxBytes=Config.TRACE_LOG_BYTES, backupCount=Config.TRACE_LOG_BACKUPS, encoding="utf-8"
+    )
+    _handler.setFormatter(logging.Formatter("%(message)s,"))
+    trace_log.addHandler(_handler)
+
+
+def record(name, start, duration, job=None, **args):
+    """Write one span that began at wall time ``start`` and lasted ``duration`` seconds."""
+    job = job or current_job.get()
+    if job is None or not trace_log.handlers:
+        return
+    user_id, message_id = job
+    trace_log.info(
+        json.dumps(
+            {
+                "name": name,
+                "cat": "job",
+                "ph": "X",
+                "ts": int(start * 1_000_000),
+                "dur": int(duration * 1_000_000),
+                # One row per job, grouped by user
+                "pid": user_id,
+                "tid": message_id,
+                "args": args,
+            }
+        )
+    )
+
+
+def record_since(name, monotonic_start, job=None, **args):
+    """Write a span from a ``time.perf_counter()`` timestamp until now."""
+    duration = time.perf_counter() - monotonic_start
+    record(name, time.time() - duration, duration, job=job, **args)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import math
+import mmap
+import os
+import time
+from pathlib import PurePath
+
+from pyrogram import Client, raw
+from pyrogram.errors import FloodWait, RPCError
+from pyrogram.session import Session
+
+from config import Config
+from .metrics import UPLOAD_PART_RETRIES, UPLOAD_SPEED
+
+logger = logging.getLogger(__name__)
+
+# The largest part Telegram accepts
+PART_SIZE = 512 * 1024
+# Bigger files must go through SaveBigFilePart
+BIG_FILE_MIN = 10 * 1024 * 1024
+
+
+class ParallelUploader:
+    """Uploads big files as SaveBigFilePart calls, many of them in flight at once.
+
+    pyrogram's ``save_file`` always uses 3 connections with 4 parts each,
+    whatever the file size. It copies every part out of the file, and it only
+    logs a failed part, which leaves a broken upload that Telegram rejects at
+    the end. Here the number of parts in flight grows with the file size.
+    Parts are ``memoryview`` slices of an mmap of the file, so nothing is
+    copied before serialization. Each part is retried on its own.
+    """
+
+    def __init__(self, max_in_flight, part_min_bytes, connections, retries):
+        self.max_in_flight = max_in_flight
+        self.part_min_bytes = part_min_bytes
+        self.connections = connections
+        self.retries = retries
+
+    def in_flight_for(self, size):
+        """One part in flight per ``part_min_bytes`` of file, up to ``max_in_flight``."""
+        return max(1, min(self.max_in_flight, size // self.part_min_bytes))
+
+    async def upload(self, client, path, progress=None, progress_args=()):
+        """Upload ``path`` and return the ``InputFileBig`` to send it with."""
+        size = os.path.getsize(path)
+        total_parts = math.ceil(size / PART_SIZE)
+        file_id = client.rnd_id()
+        in_flight = self.in_flight_for(size)
+        sessions = [
+            Session(
+                client, await client.storage.dc_id(), await client.storage.auth_key(),
+                await client.storage.test_mode(), is_media=True
+            )
+            for _ in range(min(self.connections, in_flight))
+        ]
+        parts = iter(range(total_parts))
+        sent = 0
+        start = time.perf_counter()
+
+        async def worker(session, view):
+            nonlocal sent
+            # The iterator is shared, so each part is handed to exactly one worker
+            for part in parts:
+                with view[part * PART_SIZE:(part + 1) * PART_SIZE] as chunk:
+                    await self._save_part(
+                        session,
+                        raw.functions.upload.SaveBigFilePart(
+                            file_id=file_id, file_part=part, file_total_parts=total_parts, bytes=chunk
+                        ),
+                    )
+                    sent += len(chunk)
+                if progress:
+                    await progress(sent, size, *progress_args)
+
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                try:
+                    await asyncio.gather(*(session.start() for session in sessions))
+                    workers = [
+                        asyncio.create_task(worker(sessions[i % len(sessions)], view)) for i in range(in_flight)
+                    ]
+                    try:
+                        await asyncio.gather(*workers)
+                    except BaseException:
+                        for task in workers:
+                            task.cancel()
+                        await asyncio.gather(*workers, return_exceptions=True)
+                        raise
+                finally:
+                    await asyncio.gather(*(session.stop() for session in sessions), return_exceptions=True)
+
+        elapsed = time.perf_counter() - start
+        if elapsed > 0:
+            UPLOAD_SPEED.labels(str(in_flight)).observe(size / elapsed)
+        return raw.types.InputFileBig(id=file_id, parts=total_parts, name=os.path.basename(path))
+
+    async def _save_part(self, session, rpc):
+        for attempt in range(self.retries + 1):
+            try:
+                if await session.invoke(rpc):
+                    return
+                error = IOError(f"Telegram did not accept part {rpc.file_part}")
+            except FloodWait as e:
+                # Longer than the session's own sleep threshold
+                error = e
+                await asyncio.sleep(e.value)
+            except (OSError, RPCError, asyncio.TimeoutError) as e:
+                error = e
+                await asyncio.sleep(min(2 ** attempt, 10))
+            if attempt == self.retries:
+                raise error
+            UPLOAD_PART_RETRIES.inc()
+            logger.warning(f"Retrying upload part {rpc.file_part}/{rpc.file_total_parts}: {error}")
+
+
+uploader = ParallelUploader(
+    Config.UPLOAD_PARTS_IN_FLIGHT, Config.UPLOAD_PART_MIN_BYTES, Config.UPLOAD_CONNECTIONS, Config.UPLOAD_PART_RETRIES
+)
+
+
+class TransferClient(Client):
+    """pyrogram Client that sends big files through ``uploader``.
+
+    Every ``send_document``/``send_video``/``send_audio`` calls ``save_file``,
+    so overriding it is enough. Small files, file objects and single-part
+    re-uploads after FilePartMissing are left to pyrogram.
+    """
+
+    async def save_file(self, path, file_id=None, file_part=0, progress=None, progress_args=()):
+        if file_id is None and isinstance(path, (str, PurePath)) and os.path.getsize(path) > BIG_FILE_MIN:
+            return await uploader.upload(self, path, progress=progress, progress_args=progress_args)
+        return await super().save_file(path, file_id, file_part, progress, progress_args)
@@ -1,45 +1,127 @@
-import math, time
+import math, time, asyncio, logging
 from datetime import datetime
 from pytz import timezone
 from config import Config, Txt 
+from pyrogram.errors import FloodWait, MessageNotModified
+from .metrics import FLOOD_WAITS
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 
-async def progress_for_pyrogram(current, total, ud_type, message, start):
-    now = time.time()
-    diff = now - start
-    
-    if round(diff % 10.00) == 0 or current == total:
-        # Calculate the usual stuff
-        percentage = current * 100 / total
-        speed = current / diff
-        elapsed_time = round(diff) * 1000
-        eta = round((total - current) / speed) if speed > 0 else 0
-        
-        # Progress bar with fancy symbols
-        elapsed_time = TimeFormatter(milliseconds=elapsed_time)
-        estimated_total_time = TimeFormatter(milliseconds=eta)
-        
-        # Create progress bar
-        progress = ''
-        for i in range(10):
-            progress += '■' if i < int(percentage/10) else '□'
-        
-        # Format the progress message with fancy symbols
-        progress_str = f"""
-{ud_type}....
-
-[{progress}] {percentage:.2f}%
+class EditBudget:
+    """Token bucket shared by every progress reporter so the bot as a whole stays under flood limits."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def try_acquire(self):
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+edit_budget = EditBudget(Config.PROGRESS_EDITS_PER_SEC, Config.PROGRESS_EDITS_PER_SEC * 2)
+
+
+class ProgressReporter:
+    """Progress of a transfer shown by editing one status message.
+
+    Pass the bound ``update`` method as pyrogram's ``progress`` callback:
+    pyrogram only awaits callbacks that are coroutine functions, which an
+    instance with an async ``__call__`` is not.
+
+    Edits are spaced at least ``min_interval`` apart, skipped when the text
+    would not change and drawn from the shared ``edit_budget``. Progress
+    edits are droppable, so when the budget is empty the update is skipped
+    rather than waited for. Speed and ETA use an exponentially weighted
+    moving average instead of the lifetime average.
+    """
+
+    def __init__(self, message, ud_type, min_interval=None, budget=edit_budget, alpha=0.3):
+        self.message = message
+        self.ud_type = ud_type
+        self.min_interval = Config.PROGRESS_INTERVAL if min_interval is None else min_interval
+        self.budget = budget
+        self.alpha = alpha
+        self.speed = 0.0
+        self._last_text = None
+        self._last_edit = 0.0
+        self._last_sample = None
+        self._edit_task = None
+
+    async def update(self, current, total, *args):
+        now = time.monotonic()
+        self._sample(now, current)
+        done = current >= total
+        if not done and (now - self._last_edit < self.min_interval or self._editing()):
+            return
+        text = self.render(current, total)
+        if text == self._last_text:
+            return
+        if done:
+            # The final state must not be dropped; wait for a running edit first
+            if self._editing():
+                await self._edit_task
+            await self._edit(text)
+            return
+        if not self.budget.try_acquire():
+            return
+        self._last_edit = now
+        self._last_text = text
+        self._edit_task = asyncio.create_task(self._edit(text))
+
+    def _editing(self):
+        return self._edit_task is not None and not self._edit_task.done()
+
+    def _sample(self, now, current):
+        if self._last_sample is None:
+            self._last_sample = (now, current)
+            return
+        last_time, last_current = self._last_sample
+        dt = now - last_time
+        if dt < 0.5:
+            return
+        rate = (current - last_current) / dt
+        self.speed = rate if not self.speed else self.alpha * rate + (1 - self.alpha) * self.speed
+        self._last_sample = (now, current)
+
+    def render(self, current, total):
+        percentage = current * 100 / total if total else 100.0
+        eta = round((total - current) / self.speed) if self.speed > 0 else 0
+        progress = ''.join('■' if i < int(percentage / 10) else '□' for i in range(10))
+        return f"""
+{self.ud_type}....
+
+[{progress}] {percentage:.1f}%
 
 ⭒ ݊ ֺ Sɪᴢᴇ: {humanbytes(current)} | {humanbytes(total)}
-⭒ ݊ ֺ Sᴩᴇᴇᴅ: {humanbytes(speed)}/s
-⭒ ݊ ֺ Eᴛᴀ: {estimated_total_time if eta != '' else "0s"}
+⭒ ݊ ֺ Sᴩᴇᴇᴅ: {humanbytes(self.speed)}/s
+⭒ ݊ ֺ Eᴛᴀ: {TimeFormatter(milliseconds=eta * 1000) or "0s"}
 ━─━─━─━─━━─━─━─━─━─━─━─"""
 
+    async def _edit(self, text):
+        self._last_text = text
         try:
-            await message.edit(progress_str)
+            await self.message.edit(text)
+        except FloodWait as e:
+            FLOOD_WAITS.labels("progress").inc()
+            self.budget.pause(e.value)
+        except MessageNotModified:
+            pass
         except Exception as e:
-            print(e)
+            logging.warning(f"Progress edit failed: {e}")
 
 def humanbytes(size):    
     if not size:
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class DiskFull(Exception):
+    pass
+
+
+class _Reservation:
+    __slots__ = ("nbytes", "paths")
+
+    def __init__(self, nbytes, paths):
+        self.nbytes = nbytes
+        self.paths = paths
+
+    def outstanding(self):
+        # Bytes already written are visible in the free space; only count the rest
+        written = 0
+        for path in self.paths:
+            try:
+                written += os.path.getsize(path)
+            except OSError:
+                pass
+        return max(0, self.nbytes - written)
+
+
+class DiskGuard:
+    """Admission control against the free space of one volume.
+
+    A job reserves the bytes it is about to write before it starts; it is
+    admitted once free space, minus what running reservations still have to
+    write and minus ``headroom``, covers the request.
+    """
+
+    def __init__(self, path, headroom):
+        self.path = path
+        self.headroom = headroom
+        self._reservations = set()
+        self._changed = asyncio.Event()
+
+    def available(self):
+        free = shutil.disk_usage(self.path).free
+        return free - self.headroom - sum(r.outstanding() for r in self._reservations)
+
+    def fits(self, nbytes):
+        return nbytes <= self.available()
+
+    @asynccontextmanager
+    async def reserve(self, nbytes, paths=(), timeout=None, on_wait=None):
+        """Hold ``nbytes`` for writing ``paths``; waits up to ``timeout`` seconds for space."""
+        if nbytes > shutil.disk_usage(self.path).total - self.headroom:
+            raise DiskFull(f"{nbytes} bytes will never fit on {self.path}")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        while not self.fits(nbytes):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise DiskFull(f"no room for {nbytes} bytes on {self.path}")
+            if not waited and on_wait:
+                await on_wait()
+            waited = True
+            self._changed.clear()
+            # Space also frees up outside our control, so poll as well
+            try:
+                await asyncio.wait_for(self._changed.wait(), 5)
+            except asyncio.TimeoutError:
+                pass
+        reservation = _Reservation(nbytes, list(paths))
+        self._reservations.add(reservation)
+        try:
+            yield reservation
+        finally:
+            self._reservations.discard(reservation)
+            self.notify()
+
+    def notify(self):
+        """Wake waiting reservations after files were removed."""
+        self._changed.set()
+
+    def stats(self):
+        usage = shutil.disk_usage(self.path)
+        return {
+            "free": usage.free,
+            "total": usage.total,
+            "reserved": sum(r.outstanding() for r in self._reservations),
+            "reservations": len(self._reservations),
+        }
+
+
+class Workspaces:
+    """Private temporary directories for jobs, with a janitor for leftovers.
+
+    Every job (and every shared download) writes into its own directory under
+    ``root``, so equal file names never collide. Files up to
+    ``fast_max_bytes`` can go to ``fast_root``, typically a tmpfs. Directories
+    that are not in use and older than ``max_age`` (or all of them at startup)
+    are removed by ``sweep``.
+    """
+
+    def __init__(self, root, fast_root=None, fast_max_bytes=0, headroom=0, max_age=3600):
+        # Absolute, because pyrogram resolves relative download paths against its own directory
+        self.root = os.path.abspath(root)
+        self.fast_root = os.path.abspath(fast_root) if fast_root else None
+        self.fast_max_bytes = fast_max_bytes
+        self.max_age = max_age
+        self._active = set()
+        self.guards = {}
+        for directory in filter(None, (self.root, self.fast_root)):
+            os.makedirs(directory, exist_ok=True)
+            self.guards[directory] = DiskGuard(directory, headroom if directory == self.root else 0)
+        self.removed = 0
+
+    def pick_root(self, size):
+        """The fast root for small files while it has room, else the disk root."""
+        if self.fast_root and 0 < size <= self.fast_max_bytes and self.guards[self.fast_root].fits(size):
+            return self.fast_root
+        return self.root
+
+    def create(self, root=None):
+        """Make a new, empty workspace under ``root`` and return its path."""
+        path = os.path.join(root or self.root, uuid.uuid4().hex)
+        self._active.add(path)
+        os.makedirs(path)
+        return path
+
+    def remove(self, workspace):
+        self._active.discard(workspace)
+        shutil.rmtree(workspace, ignore_errors=True)
+        guard = self.guards.get(os.path.dirname(workspace))
+        if guard:
+            guard.notify()
+
+    def discard(self, path):
+        """Remove a file together with the workspace it was produced in."""
+        workspace = os.path.dirname(path)
+        if workspace in self._active:
+            self.remove(workspace)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def sweep(self, startup=False):
+        """Remove abandoned workspaces; returns how many were removed."""
+        removed = 0
+        now = time.time()
+        for root in self.guards:
+            for entry in os.scandir(root):
+                if entry.path in self._active:
+                    continue
+                try:
+                    if not startup and now - entry.stat().st_mtime < self.max_age:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.remove(entry.path)
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Janitor could not remove {entry.path}: {e}")
+        if removed:
+            logger.info(f"Janitor removed {removed} stale workspace(s)")
+        self.removed += removed
+        return removed
+
+    async def janitor(self, interval):
+        """Sweep leftovers from a previous run now, then every ``interval`` seconds."""
+        loop = asyncio.get_running_loop()
+        startup = True
+        while True:
+            try:
+                # rmtree of multi-GB leftovers must not stall the event loop
+                if await loop.run_in_executor(None, self.sweep, startup):
+                    for guard in self.guards.values():
+                        guard.notify()
+            except Exception as e:
+                logger.error(f"Janitor sweep failed: {e}")
+            startup = False
+            await asyncio.sleep(interval)
+
+    def stats(self):
+        stats = self.guards[self.root].stats()
+        stats["active"] = len(self._active)
+        stats["removed"] = self.removed
+        return stats
+
+
+workspaces = Workspaces(
+    Config.WORKSPACE_DIR,
+    fast_root=Config.FAST_WORKSPACE_DIR,
+    fast_max_bytes=Config.FAST_WORKSPACE_MAX_FILE,
+    headroom=Config.DISK_HEADROOM,
+    max_age=Config.WORKSPACE_MAX_AGE,
+)
@@ -1,13 +1,17 @@
 from config import Config, Txt
 from helper.database import AshutoshGoswami24
+from helper.broadcast import Broadcast, start_broadcast, active_broadcasts
+from helper.subscription import membership
+from helper.result_cache import result_cache
+from helper.singleflight import shared_files
+from helper.ffmpeg import ffmpeg_pool
+from helper.workspace import workspaces
+from helper.clients import client_pool
+from helper.journal import download_journal
+from helper import profiler
+from helper.utils import humanbytes
 from pyrogram.types import Message
 from pyrogram import Client, filters
-from pyrogram.errors import (
-    FloodWait,
-    InputUserDeactivated,
-    UserIsBlocked,
-    PeerIdInvalid,
-)
 import os, sys, time, asyncio, logging, datetime
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
@@ -67,6 +71,17 @@ async def ping(_, message):
 @Client.on_message(filters.command(["stats", "status"]) & filters.user(Config.ADMIN))
 async def get_stats(bot, message):
     total_users = await AshutoshGoswami24.total_users_count()
+    cache = AshutoshGoswami24.settings_cache_stats()
+    subs = membership.stats()
+    results = result_cache.stats()
+    shared = shared_files.stats()
+    ffmpeg = ffmpeg_pool.stats()
+    disk = workspaces.stats()
+    resumes = download_journal.stats()
+    sessions = ", ".join(
+        f"{s['name']} {s['active']}" + ("" if s["healthy"] else " down") + (f" wait {s['benched']}s" if s["benched"] else "")
+        for s in client_pool.stats()
+    )
     # uptime = time.strftime("%Hh%Mm%Ss", time.gmtime(time.time() - bot.uptime))
     start_t = time.time()
     st = await message.reply("**Accessing The Details.....**")
@@ -74,57 +89,47 @@ async def get_stats(bot, message):
     time_taken_s = (end_t - start_t) * 1000
     await st.edit(
         text=f"**--Bot Status--** \n\n**🐌 Current Ping :** `{time_taken_s:.3f} ms` \n**👭 Total Users :** `{total_users}`"
+        f"\n**🗂 Settings Cache :** `{cache['hits']} hits / {cache['misses']} misses ({cache['hit_ratio']:.0%})`"
+        f"\n**📢 Force-Sub Cache :** `{subs['hit_ratio']:.0%} hits, {subs['avg_ms']} ms avg / {subs['p95_ms']} ms p95 check`"
+        f"\n**♻️ Result Cache :** `{results['hits']} hits / {results['misses']} misses ({results['hit_ratio']:.0%})`"
+        f"\n**🔗 Shared Downloads :** `{shared['coalesced']} joined / {shared['started']} started, {shared['in_flight']} in flight`"
+        f"\n**🎞 FFmpeg :** `{ffmpeg['running']}/{ffmpeg['workers']} running, {ffmpeg['completed']} done, {ffmpeg['failed']} failed ({ffmpeg['timed_out']} timed out)`"
+        f"\n**💾 Disk :** `{humanbytes(disk['free'])} free, {humanbytes(disk['reserved'])} reserved, {disk['active']} workspaces`"
+        f"\n**📡 Sessions :** `{sessions}`"
+        f"\n**⏯ Resumed Downloads :** `{resumes['resumed']}, {humanbytes(resumes['saved_bytes'])} not fetched again`"
     )
 
 
+@Client.on_message(filters.command("profile") & filters.user(Config.ADMIN))
+async def profile_handler(bot, message):
+    try:
+        seconds = int(message.command[1]) if len(message.command) > 1 else 30
+    except ValueError:
+        return await message.reply_text("Usage: `/profile [seconds]`")
+    seconds = max(1, min(seconds, Config.PROFILE_MAX_SECONDS))
+    if profiler.running():
+        return await message.reply_text("A profile is already running.")
+    status = await message.reply_text(f"**Profiling CPU and memory for {seconds}s...**")
+    workspace = workspaces.create()
+    try:
+        paths = await profiler.profile(seconds, workspace)
+        await status.edit("**Profile finished, sending reports...**")
+        for path in paths:
+            await message.reply_document(path)
+    except Exception as e:
+        logging.exception(f"Profiling failed: {e}")
+        await status.edit(f"**Profiling failed:** {e}")
+    finally:
+        workspaces.remove(workspace)
+
+
 @Client.on_message(
     filters.command("broadcast") & filters.user(Config.ADMIN) & filters.reply
 )
 async def broadcast_handler(bot: Client, m: Message):
     # await bot.send_message(Config.LOG_CHANNEL, f"{m.from_user.mention} or {m.from_user.id} Is Started The Broadcast......")
-    all_users = await AshutoshGoswami24.get_all_users()
-    broadcast_msg = m.reply_to_message
+    if active_broadcasts:
+        return await m.reply_text("A broadcast is already running. Please wait for it to finish.")
     sts_msg = await m.reply_text("Broadcast Started..!")
-    done = 0
-    failed = 0
-    success = 0
-    start_time = time.time()
-    total_users = await AshutoshGoswami24.total_users_count()
-    async for user in all_users:
-        sts = await send_msg(user["_id"], broadcast_msg)
-        if sts == 200:
-            success += 1
-        else:
-            failed += 1
-        if sts == 400:
-            await AshutoshGoswami24.delete_user(user["_id"])
-        done += 1
-        if not done % 20:
-            await sts_msg.edit(
-                f"Broadcast In Progress: \n\nTotal Users {total_users} \nCompleted : {done} / {total_users}\nSuccess : {success}\nFailed : {failed}"
-            )
-    completed_in = datetime.timedelta(seconds=int(time.time() - start_time))
-    await sts_msg.edit(
-        f"Bʀᴏᴀᴅᴄᴀꜱᴛ Cᴏᴍᴩʟᴇᴛᴇᴅ: \nCᴏᴍᴩʟᴇᴛᴇᴅ Iɴ `{completed_in}`.\n\nTotal Users {total_users}\nCompleted: {done} / {total_users}\nSuccess: {success}\nFailed: {failed}"
-    )
-
-
-async def send_msg(user_id, message):
-    try:
-        await message.copy(chat_id=int(user_id))
-        return 200
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-        return send_msg(user_id, message)
-    except InputUserDeactivated:
-        logger.info(f"{user_id} : Deactivated")
-        return 400
-    except UserIsBlocked:
-        logger.info(f"{user_id} : Blocked The Bot")
-        return 400
-    except PeerIdInvalid:
-        logger.info(f"{user_id} : User ID Invalid")
-        return 400
-    except Exception as e:
-        logger.error(f"{user_id} : {e}")
-        return 500
+    broadcast = await Broadcast.create(bot, m.reply_to_message, sts_msg)
+    start_broadcast(broadcast)
@@ -1,6 +1,7 @@
 from pyrogram import Client, filters
 from pyrogram.errors import FloodWait
 from helper.database import AshutoshGoswami24
+from helper.templates import filename_template, validate, TemplateError
 
 @Client.on_message(filters.private & filters.command("autorename"))
 async def auto_rename_command(client, message):
@@ -9,6 +10,11 @@ async def auto_rename_command(client, message):
     # Extract the format from the command
     format_template = message.text.split("/autorename", 1)[1].strip()
 
+    try:
+        validate(filename_template(format_template))
+    except TemplateError as e:
+        return await message.reply_text(f"**Invalid format template:** {e}")
+
     # Save the format template to the database
     await AshutoshGoswami24.set_format_template(user_id, format_template)
 
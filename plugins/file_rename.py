@@ -1,79 +1,35 @@
 from pyrogram import Client, filters
 from pyrogram.errors import FloodWait
-from pyrogram.types import InputMediaDocument, Message
-from PIL import Image
+from pyrogram.types import InputMediaDocument, InputMediaVideo, InputMediaAudio, Message
 from datetime import datetime
-from hachoir.metadata import extractMetadata
-from hachoir.parser import createParser
-from helper.utils import humanbytes, convert
+from helper.utils import humanbytes, convert, ProgressReporter
+from helper.filename_parser import extract_file_info
+from helper.templates import filename_template, caption_template, validate, TemplateError
 from helper.database import AshutoshGoswami24
+from helper.clients import client_pool
+from helper.journal import download_journal
+from helper.probe import media_probe
+from helper.scheduler import rename_scheduler, QueueFull
+from helper.remux import can_stream, stream_remux, remux_file
+from helper.singleflight import shared_files
+from helper.workspace import workspaces
+from helper.metrics import JOBS, STAGE_SECONDS, StageTimer, record_transfer
+from helper.tracing import current_job, record_since
+from helper.pipeline import BatchCollector
+from helper.thumbnail import thumb_cache, thumb_unique_id, process_thumbnail
+from helper.result_cache import result_cache
 from config import Config
 import os
 import time
+import hashlib
+import shutil
 import re
-import subprocess
 import asyncio
+import logging
+from contextlib import AsyncExitStack
 
 renaming_operations = {}
 
-PATTERNS = {
-    # Season and episode patterns
-    'season_ep': re.compile(r'S(\d+)[._\s]?(?:E|EP)(\d+)', re.IGNORECASE),
-    
-    # Clean resolution pattern - only common resolutions
-    'resolution': re.compile(r'(?:2160|1080|720|480)p|4k', re.IGNORECASE),
-    
-    # Clean audio pattern
-    'audio': re.compile(r'\b(?:DUB|SUB|DUAL(?:\s*AUDIO)?)\b', re.IGNORECASE)
-}
-
-def extract_file_info(filename):
-    """Extract title, season, episode, resolution and audio information from filename."""
-    info = {
-        'title': '',
-        'season': '1',
-        'episode': '1',
-        'resolution': '',
-        'audio': ''
-    }
-    
-    # Remove file extension
-    filename = os.path.splitext(filename)[0]
-    
-    # Extract season and episode
-    season_ep_match = PATTERNS['season_ep'].search(filename)
-    if season_ep_match:
-        info['season'] = season_ep_match.group(1)
-        info['episode'] = season_ep_match.group(2)
-        # Remove the matched part for cleaner title extraction
-        filename = PATTERNS['season_ep'].sub('', filename)
-    
-    # Extract resolution
-    resolution_match = PATTERNS['resolution'].search(filename)
-    if resolution_match:
-        res = resolution_match.group(0).upper()
-        info['resolution'] = '4K' if res == '4K' else res
-        filename = PATTERNS['resolution'].sub('', filename)
-    
-    # Extract audio type
-    audio_match = PATTERNS['audio'].search(filename)
-    if audio_match:
-        audio_type = audio_match.group(0).upper()
-        if 'DUAL' in audio_type:
-            info['audio'] = 'dual'
-        elif 'SUB' in audio_type:
-            info['audio'] = 'sub'
-        elif 'DUB' in audio_type:
-            info['audio'] = 'dub'
-        filename = PATTERNS['audio'].sub('', filename)
-    
-    # Clean remaining text as title
-    info['title'] = re.sub(r'[._]', ' ', filename)
-    info['title'] = re.sub(r'\s+', ' ', info['title'])
-    info['title'] = info['title'].strip()
-    
-    return info
-
 def format_episode_number(episode):
     """Format episode number with leading zeros."""
     try:
@@ -85,8 +41,11 @@ def format_episode_number(episode):
 async def set_file_format(client, message):
     try:
         format_text = message.text.split("/file ", 1)[1]
+        validate(filename_template(format_text))
         await AshutoshGoswami24.set_format_template(message.from_user.id, format_text)
         await message.reply_text("File format template set successfully! ✅")
+    except TemplateError as e:
+        await message.reply_text(f"**Invalid format template:** {e}")
     except IndexError:
         await message.reply_text(
             "Please provide a format template.\n\n"
@@ -95,33 +54,63 @@ async def set_file_format(client, message):
             "• {season} - for anime season\n"
             "• {episode} - for anime episode\n"
             "• {resolution} - for video resolution\n"
-            "• {audio} - audio type (sub/dub/dual)\n\n"
+            "• {audio} - audio type (sub/dub/dual)\n"
+            "• {codec} / {audio_codec} - video / audio codec\n"
+            "• {group} - release group\n\n"
+            "Segments in [ ] or ( ) are dropped when their variables are empty.\n\n"
             "Example:\n`/file S{season}E{episode} {title} [{audio}] {resolution}`"
         )
 
-async def format_filename(template, file_info):
+class MetadataError(Exception):
+    pass
+
+
+async def send_media(client, chat_id, media_type, media, caption, file_name=None, thumb=None, progress=None, info=None):
+    """Send a path or an existing file_id as the user's preferred media type.
+
+    ``info`` is a ``media_probe`` result; its duration and dimensions let
+    Telegram clients stream and seek the video.
+    """
+    info = info or {}
+    if media_type == "video":
+        return await client.send_video(
+            chat_id,
+            video=media,
+            caption=caption,
+            file_name=file_name,
+            thumb=thumb,
+            duration=info.get("duration", 0),
+            width=info.get("width", 0),
+            height=info.get("height", 0),
+            progress=progress,
+        )
+    if media_type == "audio":
+        return await client.send_audio(
+            chat_id,
+            audio=media,
+            caption=caption,
+            file_name=file_name,
+            thumb=thumb,
+            duration=info.get("duration", 0),
+            progress=progress,
+        )
+    return await client.send_document(
+        chat_id, document=media, file_name=file_name, thumb=thumb, caption=caption, progress=progress
+    )
+
+def format_filename(template, file_info):
     """Format filename according to template and extracted information."""
-    result = template
-    
-    replacements = {
-        '{title}': file_info['title'],
-        '{season}': file_info['season'],
-        '{episode}': format_episode_number(file_info['episode']),
-        '{resolution}': file_info['resolution'],
-        '{audio}': file_info['audio']
-    }
-    
-    for key, value in replacements.items():
-        result = result.replace(key, str(value))
-    
-    return result
+    return filename_template(template).render(
+        file_info, episode=format_episode_number(file_info['episode'])
+    )
 
 @Client.on_message(filters.private & (filters.document | filters.video | filters.audio))
 async def auto_rename_files(client, message):
     user_id = message.from_user.id
-    format_template = await AshutoshGoswami24.get_format_template(user_id)
-    media_preference = await AshutoshGoswami24.get_media_preference(user_id)
-    extract_source = await AshutoshGoswami24.get_extract_source(user_id)
+    settings = await AshutoshGoswami24.get_settings(user_id)
+    format_template = settings["format_template"]
+    media_preference = settings["media_type"]
+    extract_source = settings["extract_source"]
     
     if not format_template:
         return await message.reply_text("Please set a file format using /file command")
@@ -136,9 +125,6 @@ async def auto_rename_files(client, message):
     
     file_info = extract_file_info(extract_text)
 
-    if not format_template:
-        return await message.reply_text("Please set an auto rename format using /autorename")
-    
     media_type, file_id, file_name = None, None, None
     if message.document:
         file_id = message.document.file_id
@@ -155,127 +141,505 @@ async def auto_rename_files(client, message):
     else:
         return await message.reply_text("Unsupported file type")
 
-    if file_id in renaming_operations and (datetime.now() - renaming_operations[file_id]).seconds < 10:
+    # Drops a redelivered update; identical files sent as separate messages share
+    # one download through shared_files instead
+    operation = (user_id, message.id)
+    if operation in renaming_operations and (datetime.now() - renaming_operations[operation]).seconds < 10:
         return
 
-    renaming_operations[file_id] = datetime.now()
+    renaming_operations[operation] = datetime.now()
 
-    file_info = extract_file_info(file_name)
-    new_name = await format_filename(format_template, file_info)
+    job = RenameJob(client, message, settings, file_id, file_name, media_type, file_info)
+    if Config.BATCH_WINDOW > 0:
+        # A forwarded season arrives as a burst of messages; rename it as one batch
+        rename_batches.add(user_id, job)
+    else:
+        await submit_batch(user_id, [job])
 
-    file_extension = os.path.splitext(file_name)[1]
-    renamed_file_name = f"{new_name}{file_extension}"
-    renamed_file_path = f"downloads/{renamed_file_name}"
-    metadata_file_path = f"Metadata/{renamed_file_name}"
 
-    os.makedirs(os.path.dirname(renamed_file_path), exist_ok=True)
-    os.makedirs(os.path.dirname(metadata_file_path), exist_ok=True)
+_batch_tasks = set()
 
-    download_msg = await message.reply_text("Downloading the file...")
 
-    try:
-        path = await client.download_media(
-            message,
-            file_name=renamed_file_path,
-            progress=progress_for_pyrogram,
-            progress_args=("⭒ ݊ ֺ Dᴏᴡɴʟᴏᴀᴅɪɴɢ Yᴏᴜʀ Fɪʟᴇ", download_msg, time.time()),
-        )
-    except Exception as e:
-        del renaming_operations[file_id]
-        return await download_msg.edit(f"**❌ Dᴏᴡɴʟᴏᴀᴅ Eʀʀᴏʀ:** {e}")
+async def submit_batch(user_id, jobs):
+    # The batch only admits and orders its files; each file runs as one scheduler job
+    task = asyncio.create_task(process_batch(user_id, jobs))
+    _batch_tasks.add(task)
+    task.add_done_callback(_batch_tasks.discard)
 
-    await download_msg.edit("⭒ ݊ ֺ Pʀᴏᴄᴇssɪɴɢ Yᴏᴜʀ Fɪʟᴇ...")
 
-    try:
-        os.rename(path, renamed_file_path)
-        path = renamed_file_path
-
-        metadata_added = False
-        if await AshutoshGoswami24.get_metadata(user_id):
-            metadata = await AshutoshGoswami24.get_metadata_code(user_id)
-            if metadata:
-                cmd = (
-                    f'ffmpeg -i "{renamed_file_path}" -map 0 -c:s copy -c:a copy -c:v copy '
-                    f'-metadata title="{metadata}" -metadata author="{metadata}" '
-                    f'-metadata:s:s title="{metadata}" -metadata:s:a title="{metadata}" '
-                    f'-metadata:s:v title="{metadata}" "{metadata_file_path}"'
-                )
-                try:
-                    process = await asyncio.create_subprocess_shell(cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-                    _, stderr = await process.communicate()
-                    if process.returncode == 0:
-                        metadata_added = True
-                        path = metadata_file_path
-                    else:
-                        return await download_msg.edit(f"**Metadata Error:**\n{stderr.decode()}")
-                except Exception as e:
-                    return await download_msg.edit(f"**Metadata Exception:**\n{str(e)}")
+async def show_position(job, message):
+    """Reply with ``job``'s place in the rename queue, deleted once it starts."""
+    position = rename_scheduler.position(job)
+    if not position:
+        return
+    queue_msg = await message.reply_text(f"⭒ ݊ ֺ Qᴜᴇᴜᴇᴅ... Pᴏsɪᴛɪᴏɴ: {position}")
+    if job.started:
+        await queue_msg.delete()
+    else:
+        job.on_start = queue_msg.delete
+
 
-        if not metadata_added:
-            path = renamed_file_path
-            await download_msg.edit("Metadata addition failed. Uploading renamed file only.")
+rename_batches = BatchCollector(Config.BATCH_WINDOW, Config.BATCH_MAX_FILES, submit_batch)
 
-        upload_msg = await download_msg.edit("⭒ ݊ ֺ Sᴛᴀʀᴛɪɴɢ Uᴘʟᴏᴀᴅ...")
-        
-        ph_path, c_thumb = None, await AshutoshGoswami24.get_thumbnail(message.chat.id)
-        c_caption = await AshutoshGoswami24.get_caption(message.chat.id)
 
-        caption = (
-            c_caption.format(filename=renamed_file_name, filesize=humanbytes(message.document.file_size), duration=convert(0))
-            if c_caption else f"**{renamed_file_name}**"
+UPLOAD_LABELS = {"video": "Vɪᴅᴇᴏ", "audio": "Aᴜᴅɪᴏ"}
+INPUT_MEDIA = {"document": InputMediaDocument, "video": InputMediaVideo, "audio": InputMediaAudio}
+# Telegram albums hold at most 10 items
+MEDIA_GROUP_SIZE = 10
+
+
+class RenameJob:
+    """One file going through the fetch, remux and upload stages.
+
+    Downloads and remuxes are shared through ``shared_files`` with any other
+    job working on the same source; ``close`` drops this job's references.
+    """
+
+    def __init__(self, client, message, settings, file_id, file_name, media_type, file_info):
+        self.client = client
+        self.message = message
+        self.trace_id = (message.chat.id, message.id)
+        self.operation = (message.from_user.id, message.id)
+        self.created = time.perf_counter()
+        self.file_id = file_id
+        self.file_name = file_name
+        self.media_type = media_type
+        self.file_info = file_info
+        self.media = message.document or message.video or message.audio
+        self.metadata = settings["metadata_code"] if settings["metadata"] else None
+
+        self.format_template = settings["format_template"]
+        self.file_extension = os.path.splitext(file_name)[1]
+        self.renamed_file_name = f"{format_filename(self.format_template, file_info)}{self.file_extension}"
+        # Not in the name: fetch reads it from the container headers before downloading
+        self.probe_resolution = not file_info["resolution"] and filename_template(self.format_template).uses(
+            "resolution"
         )
 
+        self.caption_source = settings["caption"]
+        self.caption = self._render_caption(getattr(self.media, "duration", None) or 0)
+        self.probe = {}
+
+        c_thumb = settings["file_id"]
+        self.thumb_source = self.thumb_key = None
         if c_thumb:
-            ph_path = await client.download_media(c_thumb)
-        elif media_type == "video" and message.video.thumbs:
-            ph_path = await client.download_media(message.video.thumbs[0].file_id)
+            self.thumb_source, self.thumb_key = c_thumb, thumb_unique_id(c_thumb)
+        elif media_type == "video" and message.video and message.video.thumbs:
+            self.thumb_source = message.video.thumbs[0].file_id
+            self.thumb_key = message.video.thumbs[0].file_unique_id
+        # Taken before any probe: the same file and settings always give the same
+        # name, so the key stays valid for the lookup that precedes the probe
+        self.result_key = result_cache.key(
+            self.media.file_unique_id, self.renamed_file_name, self.metadata, self.thumb_key, media_type
+        )
+
+        # Downloads and remuxes are shared by every job renaming the same source at
+        # the same time; each is produced in its own workspace under this root
+        unique_id = self.media.file_unique_id
+        self.root = workspaces.pick_root(self.media.file_size)
+        self.source_key = ("source", unique_id)
+        self.source_name = f"{unique_id}{self.file_extension}"
+        self.remux_key = ("remux", unique_id, self.metadata)
+        self.remux_name = f"{unique_id}-{hashlib.sha1(str(self.metadata).encode()).hexdigest()[:12]}{self.file_extension}"
+
+        self.status_msg = None
+        self.stage = "download"
+        self.done = False
+        self.cached = False
+        self.cached_file_id = None
+        self.key = None
+        self.started = None
+        self.source = None
+        self.path = None
+        self.ph_path = None
+        self.album_path = None
+        self.workspace = None
+        self.reservation = None
+        self._reserved = AsyncExitStack()
+        self._source_refs = AsyncExitStack()
+        self._refs = AsyncExitStack()
+
+    def _render_caption(self, duration):
+        if not self.caption_source:
+            return f"**{self.renamed_file_name}**"
+        return caption_template(self.caption_source).render(
+            filename=self.renamed_file_name,
+            filesize=humanbytes(self.media.file_size),
+            duration=convert(duration),
+        )
+
+    def _apply_resolution(self, info):
+        if not info or not info["resolution"]:
+            return
+        self.file_info["resolution"] = info["resolution"]
+        self.renamed_file_name = f"{format_filename(self.format_template, self.file_info)}{self.file_extension}"
+        self.caption = self._render_caption(getattr(self.media, "duration", None) or 0)
 
-        if ph_path:
-            img = Image.open(ph_path).convert("RGB")
-            img = img.resize((320, 320))
-            img.save(ph_path, "JPEG")
+    @property
+    def episode_order(self):
+        season, episode = self.file_info["season"], self.file_info["episode"]
+        return (
+            int(season) if str(season).isdigit() else 0,
+            int(episode) if str(episode).isdigit() else 0,
+        )
 
+    def _workspace_file(self, name):
+        workspace = workspaces.create(self.root)
+        if self.reservation:
+            self.reservation.paths.append(os.path.join(workspace, name))
+        return workspace, os.path.join(workspace, name)
+
+    async def _download_source(self):
+        workspace, path = self._workspace_file(self.source_name)
+        if self.reservation:
+            # Big downloads are written to a resumable partial file first
+            self.reservation.paths.append(download_journal.partial_path(self.media.file_unique_id))
         try:
-            if media_type == "document":
-                await client.send_document(
-                    message.chat.id,
-                    document=path,
-                    thumb=ph_path,
-                    caption=caption,
-                    progress=progress_for_pyrogram,
-                    progress_args=("⭒ ݊ ֺ Uᴘʟᴏᴀᴅɪɴɢ Yᴏᴜʀ Fɪʟᴇ", upload_msg, time.time())
-                )
-            elif media_type == "video":
-                await client.send_video(
-                    message.chat.id,
-                    video=path,
-                    caption=caption,
-                    thumb=ph_path,
-                    duration=0,
-                    progress=progress_for_pyrogram,
-                    progress_args=("⭒ ݊ ֺ Uᴘʟᴏᴀᴅɪɴɢ Yᴏᴜʀ Vɪᴅᴇᴏ", upload_msg, time.time())
-                )
-            elif media_type == "audio":
-                await client.send_audio(
-                    message.chat.id,
-                    audio=path,
-                    caption=caption,
-                    thumb=ph_path,
-                    duration=0,
-                    progress=progress_for_pyrogram,
-                    progress_args=("⭒ ݊ ֺ Uᴘʟᴏᴀᴅɪɴɢ Yᴏᴜʀ Aᴜᴅɪᴏ", upload_msg, time.time())
+            async with rename_scheduler.stage("network"):
+                with StageTimer("download") as timer:
+                    progress = ProgressReporter(self.status_msg, "⭒ ݊ ֺ Dᴏᴡɴʟᴏᴀᴅɪɴɢ Yᴏᴜʀ Fɪʟᴇ").update
+                    path = await client_pool.download(
+                        self.message,
+                        lambda client, message: download_journal.download(client, message, path, progress=progress),
+                    )
+            record_transfer("download", self.media.file_size, timer.elapsed)
+            return path
+        except BaseException:
+            workspaces.remove(workspace)
+            raise
+
+    async def _remux_source(self):
+        workspace, path = self._workspace_file(self.remux_name)
+        try:
+            return await self._remux_into(path)
+        except BaseException:
+            workspaces.remove(workspace)
+            raise
+
+    async def _remux_into(self, path):
+        if self.source is None and Config.STREAM_REMUX and can_stream(self.file_name):
+            # Single on-disk copy: the download is piped into ffmpeg as it arrives
+            try:
+                async with rename_scheduler.stage("network"):
+                    # Also observed as "ffmpeg" by the executor: both run for the whole stream
+                    with StageTimer("download") as timer:
+                        progress = ProgressReporter(self.status_msg, "⭒ ݊ ֺ Dᴏᴡɴʟᴏᴀᴅɪɴɢ Yᴏᴜʀ Fɪʟᴇ").update
+                        streamed, stderr = await client_pool.download(
+                            self.message,
+                            lambda client, message: stream_remux(
+                                client, message, path, self.metadata, progress=progress
+                            ),
+                        )
+                if streamed:
+                    record_transfer("download", self.media.file_size, timer.elapsed)
+                    return path
+                logging.warning(f"Streaming remux failed for {self.file_name}, falling back: {stderr[-500:]}")
+            except Exception as e:
+                logging.warning(f"Streaming remux failed for {self.file_name}, falling back: {e}")
+        # Joins this job's own source flight when the fetch stage already downloaded it
+        async with shared_files.acquire(self.source_key, self._download_source) as src:
+            ok, stderr = await remux_file(
+                src,
+                path,
+                self.metadata,
+                duration=getattr(self.media, "duration", None) or 0,
+                progress=ProgressReporter(self.status_msg, "⭒ ݊ ֺ Pʀᴏᴄᴇssɪɴɢ Yᴏᴜʀ Fɪʟᴇ").update,
+            )
+        if not ok:
+            # Telegram messages are capped at 4096 characters
+            raise MetadataError(stderr[-1000:])
+        return path
+
+    async def admit(self):
+        """Look the result up and reserve disk for the download, before a scheduler slot is taken.
+
+        Waiting for space here rather than in ``fetch`` leaves the slots to the
+        jobs whose uploads free that space.
+        """
+        current_job.set(self.trace_id)
+        self.started = time.perf_counter()
+        self.cached_file_id = await result_cache.get(self.result_key)
+        streamable = Config.STREAM_REMUX and can_stream(self.file_name)
+        self.key = self.remux_key if self.metadata and streamable else self.source_key
+        if not self.cached_file_id:
+            await self._reserve(Config.DISK_WAIT_TIMEOUT)
+
+    async def _reserve(self, timeout):
+        if shared_files.in_flight(self.key):
+            # Joining a shared download still leaves this job's own remuxed copy to write
+            size = self.media.file_size if self.metadata and self.key == self.source_key else 0
+        else:
+            # Admission control: the download and, when remuxing, its copy must fit
+            size = self.media.file_size * (2 if self.metadata else 1)
+        if size:
+            self.reservation = await self._reserved.enter_async_context(
+                workspaces.guards[self.root].reserve(size, timeout=timeout, on_wait=self._waiting_for_disk)
+            )
+
+    async def _waiting_for_disk(self):
+        if self.status_msg:
+            await self.status_msg.edit("⭒ ݊ ֺ Wᴀɪᴛɪɴɢ Fᴏʀ Fʀᴇᴇ Dɪsᴋ Sᴘᴀᴄᴇ...")
+        else:
+            self.status_msg = await self.message.reply_text("⭒ ݊ ֺ Wᴀɪᴛɪɴɢ Fᴏʀ Fʀᴇᴇ Dɪsᴋ Sᴘᴀᴄᴇ...")
+
+    async def fetch(self):
+        """Send the cached result found by ``admit``, or download (and stream-remux when possible)."""
+        current_job.set(self.trace_id)
+        record_since("queued", self.created)
+        if self.cached_file_id:
+            if self.probe_resolution:
+                # Only for the caption; the cached upload already carries the full name
+                self._apply_resolution(media_probe.cached(self.media.file_unique_id))
+            try:
+                await send_media(self.client, self.message.chat.id, self.media_type, self.cached_file_id, self.caption)
+                self.done = self.cached = True
+                return
+            except Exception as e:
+                logging.warning(f"Cached result for {self.renamed_file_name} could not be sent: {e}")
+                await result_cache.invalidate(self.result_key)
+            # Rare enough to not wait for space while holding the slot: fail fast instead
+            await self._reserve(0)
+
+        if self.status_msg:
+            await self.status_msg.edit("Downloading the file...")
+        else:
+            self.status_msg = await self.message.reply_text("Downloading the file...")
+        if self.probe_resolution:
+            async with rename_scheduler.stage("network"):
+                with StageTimer("probe"):
+                    self._apply_resolution(await client_pool.download(self.message, media_probe.probe_message))
+        self.workspace = workspaces.create(self.root)
+        if shared_files.in_flight(self.key):
+            await self.status_msg.edit("⭒ ݊ ֺ Sᴀᴍᴇ Fɪʟᴇ Is Aʟʀᴇᴀᴅʏ Bᴇɪɴɢ Dᴏᴡɴʟᴏᴀᴅᴇᴅ, Wᴀɪᴛɪɴɢ...")
+        if self.key == self.remux_key:
+            self.path = await self._refs.enter_async_context(shared_files.acquire(self.key, self._remux_source))
+        else:
+            self.source = await self._source_refs.enter_async_context(
+                shared_files.acquire(self.key, self._download_source)
+            )
+
+    async def remux(self):
+        current_job.set(self.trace_id)
+        if self.done or self.path:
+            return
+        if not self.metadata:
+            self.path = self.source
+            await self._reserved.aclose()
+            return
+        self.stage = "metadata"
+        self.path = await self._refs.enter_async_context(shared_files.acquire(self.remux_key, self._remux_source))
+        # The remuxed copy is all the upload needs; free the download early
+        await self._source_refs.aclose()
+        self.source = None
+        await self._reserved.aclose()
+
+    async def prepare_upload(self):
+        current_job.set(self.trace_id)
+        self.stage = "upload"
+        await self.status_msg.edit("⭒ ݊ ֺ Sᴛᴀʀᴛɪɴɢ Uᴘʟᴏᴀᴅ...")
+        with StageTimer("probe"):
+            self.probe = await media_probe.probe_file(self.media.file_unique_id, self.path) or {}
+        if self.probe.get("duration") and not getattr(self.media, "duration", None):
+            # Documents carry no duration; the caption showed 0 until now
+            self.caption = self._render_caption(self.probe["duration"])
+        if self.thumb_source:
+            self.ph_path = thumb_cache.get(self.thumb_key)
+            if not self.ph_path:
+                with StageTimer("thumbnail"):
+                    raw_path = await self.client.download_media(
+                        self.thumb_source, file_name=os.path.join(self.workspace, "thumb.jpg")
+                    )
+                    await process_thumbnail(raw_path)
+                self.ph_path = thumb_cache.put(self.thumb_key, raw_path)
+
+    async def upload(self):
+        if self.done:
+            return
+        await self.prepare_upload()
+        async with rename_scheduler.stage("network"):
+            with StageTimer("upload") as timer:
+                progress = ProgressReporter(
+                    self.status_msg, f"⭒ ݊ ֺ Uᴘʟᴏᴀᴅɪɴɢ Yᴏᴜʀ {UPLOAD_LABELS.get(self.media_type, 'Fɪʟᴇ')}"
+                ).update
+                sent = await client_pool.upload(
+                    self.message.chat.id,
+                    lambda client, chat_id: send_media(
+                        client,
+                        chat_id,
+                        self.media_type,
+                        self.path,
+                        self.caption,
+                        file_name=self.renamed_file_name,
+                        thumb=self.ph_path,
+                        progress=progress,
+                        info=self.probe,
+                    ),
                 )
+        record_transfer("upload", os.path.getsize(self.path), timer.elapsed)
+        await self.uploaded(sent)
+
+    async def uploaded(self, sent):
+        self.done = True
+        uploaded = sent and (sent.document or sent.video or sent.audio)
+        if uploaded:
+            await result_cache.put(self.result_key, uploaded.file_id)
+
+    def input_media(self):
+        # Album items are named after their path, so link the shared file under the new name
+        self.album_path = os.path.join(self.workspace, self.renamed_file_name)
+        if not os.path.exists(self.album_path):
+            try:
+                os.link(self.path, self.album_path)
+            except OSError:
+                shutil.copyfile(self.path, self.album_path)
+        attributes = {}
+        if self.media_type == "video":
+            attributes = {key: self.probe.get(key, 0) for key in ("duration", "width", "height")}
+        elif self.media_type == "audio":
+            attributes = {"duration": self.probe.get("duration", 0)}
+        return INPUT_MEDIA[self.media_type](
+            media=self.album_path, caption=self.caption, thumb=self.ph_path, **attributes
+        )
+
+    async def fail(self, error):
+        if isinstance(error, QueueFull):
+            text = "You already have too many files waiting in the queue. Please wait for them to finish."
+        elif isinstance(error, MetadataError):
+            text = f"**Metadata Error:**\n{error}"
+        elif self.stage == "upload":
+            text = f"**Upload Error:** {error}"
+        else:
+            text = f"**❌ Dᴏᴡɴʟᴏᴀᴅ Eʀʀᴏʀ:** {error}"
+        logging.warning(f"Renaming {self.file_name} failed during {self.stage}: {error}")
+        try:
+            if self.status_msg:
+                await self.status_msg.edit(text)
+            else:
+                await self.message.reply_text(text)
+        except Exception as e:
+            logging.warning(f"Could not report rename failure: {e}")
+
+    async def close(self):
+        if self.started:
+            result = "cached" if self.cached else "ok" if self.done else "failed"
+            STAGE_SECONDS.labels("job").observe(time.perf_counter() - self.started)
+            record_since("job", self.started, job=self.trace_id, file=self.renamed_file_name, result=result)
+            JOBS.labels(result).inc()
+            self.started = None
+        await self._refs.aclose()
+        await self._source_refs.aclose()
+        if self.ph_path:
+            thumb_cache.release(self.thumb_key)
+            self.ph_path = None
+        await self._reserved.aclose()
+        if self.workspace:
+            workspaces.remove(self.workspace)
+            self.workspace = None
+        renaming_operations.pop(self.operation, None)
+
+
+async def process_batch(user_id, jobs):
+    """Rename a user's files in episode order.
+
+    Each file holds one scheduler slot from download to upload, so the global
+    and per-user caps count files in flight; the stages of different files
+    still overlap through the stage semaphores and the ffmpeg pool. A file is
+    admitted (result lookup, disk reservation) before it asks for a slot, and
+    at most ``MAX_JOBS_PER_USER`` files of a batch are admitted at a time.
+    Uploads keep the batch order. With ``BATCH_MEDIA_GROUP`` the results are
+    sent as albums of up to ten files.
+    """
+    jobs = sorted(jobs, key=lambda job: job.episode_order)
+    client = jobs[0].client
+    loop = asyncio.get_running_loop()
+    group = []
+    window = asyncio.Semaphore(max(1, Config.MAX_JOBS_PER_USER))
+    # Resolved once a file and every file before it have been sent or have failed
+    turns = [loop.create_future() for _ in jobs]
+
+    async def send_group():
+        if not group:
+            return
+        try:
+            async with rename_scheduler.stage("network"):
+                with StageTimer("upload") as timer:
+                    sent = await client.send_media_group(group[0].message.chat.id, [job.input_media() for job in group])
+            record_transfer("upload", sum(os.path.getsize(job.path) for job in group), timer.elapsed)
+            for job, msg in zip(group, sent):
+                await job.uploaded(msg)
         except Exception as e:
-            os.remove(path)
-            if ph_path:
-                os.remove(ph_path)
-            return await upload_msg.edit(f"**Upload Error:** {e}")
+            for job in group:
+                await job.fail(e)
+        else:
+            for job in group:
+                try:
+                    await job.status_msg.delete()
+                except Exception as e:
+                    # The files are already sent; a stale progress message is not a failure
+                    logging.warning(f"Could not delete the status message for {job.renamed_file_name}: {e}")
+        for job in group:
+            await job.close()
+        group.clear()
+
+    async def add_to_group(job):
+        if job.done:
+            return
+        if group and group[0].media_type != job.media_type:
+            # Documents, videos and audio can't share an album
+            await send_group()
+        await job.prepare_upload()
+        group.append(job)
+        if len(group) >= MEDIA_GROUP_SIZE:
+            await send_group()
+
+    def finish(index):
+        if index == 0 or turns[index - 1].done():
+            turns[index].set_result(None)
+        else:
+            turns[index - 1].add_done_callback(lambda _: turns[index].set_result(None))
+
+    upload = add_to_group if Config.BATCH_MEDIA_GROUP and len(jobs) > 1 else RenameJob.upload
 
-    except Exception as e:
-        await download_msg.edit(f"**Error:** {e}")
+    async def run(index, job):
+        try:
+            await job.fetch()
+            await job.remux()
+            if index:
+                await turns[index - 1]
+            await upload(job)
+        except Exception as e:
+            await job.fail(e)
+        finally:
+            if job not in group:
+                await job.close()
+            finish(index)
+            window.release()
 
+    try:
+        for index, job in enumerate(jobs):
+            await window.acquire()
+            try:
+                await job.admit()
+                scheduled = rename_scheduler.submit(user_id, lambda index=index, job=job: run(index, job))
+            except Exception as e:
+                await job.fail(e)
+                await job.close()
+                finish(index)
+                window.release()
+                continue
+            if index == 0:
+                # Only the first file of a batch reports its place in the queue
+                try:
+                    await show_position(scheduled, job.message)
+                except Exception as e:
+                    logging.warning(f"Could not show the queue position to {user_id}: {e}")
+        await turns[-1]
+        if group:
+            try:
+                await rename_scheduler.submit(user_id, send_group)
+            except QueueFull as e:
+                for job in group:
+                    await job.fail(e)
     finally:
-        for p in [renamed_file_path, metadata_file_path, ph_path]:
-            if p and os.path.exists(p):
-                os.remove(p)
-        del renaming_operations[file_id]
+        for job in jobs:
+            await job.close()
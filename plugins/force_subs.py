@@ -1,33 +1,19 @@
 import os
 from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
-from pyrogram.errors import UserNotParticipant
-from config import Config
-
-FORCE_SUB_CHANNELS = Config.FORCE_SUB_CHANNELS
+from helper.subscription import membership
 
 
 async def not_subscribed(_, __, message):
-    for channel in FORCE_SUB_CHANNELS:
-        try:
-            user = await message._client.get_chat_member(channel, message.from_user.id)
-            if user.status in {"kicked", "left"}:
-                return True
-        except UserNotParticipant:
-            return True
-    return False
+    return bool(await membership.not_joined(message._client, message.from_user.id))
 
 
 @Client.on_message(filters.private & filters.create(not_subscribed))
 async def forces_sub(client, message):
-    not_joined_channels = []
-    for channel in FORCE_SUB_CHANNELS:
-        try:
-            user = await client.get_chat_member(channel, message.from_user.id)
-            if user.status in {"kicked", "left"}:
-                not_joined_channels.append(channel)
-        except UserNotParticipant:
-            not_joined_channels.append(channel)
+    # The filter just ran the check; reuse its result so the lookup is counted once
+    not_joined_channels = membership.cached(message.from_user.id)
+    if not_joined_channels is None:
+        not_joined_channels = await membership.not_joined(client, message.from_user.id)
 
     buttons = [
         [
@@ -52,15 +38,8 @@ async def forces_sub(client, message):
 @Client.on_callback_query(filters.regex("check_subscription"))
 async def check_subscription(client, callback_query: CallbackQuery):
     user_id = callback_query.from_user.id
-    not_joined_channels = []
-
-    for channel in FORCE_SUB_CHANNELS:
-        try:
-            user = await client.get_chat_member(channel, user_id)
-            if user.status in {"kicked", "left"}:
-                not_joined_channels.append(channel)
-        except UserNotParticipant:
-            not_joined_channels.append(channel)
+    membership.invalidate(user_id)
+    not_joined_channels = await membership.not_joined(client, user_id)
 
     if not not_joined_channels:
         await callback_query.message.edit_text(
@@ -1,5 +1,7 @@
 from pyrogram import Client, filters
 from helper.database import AshutoshGoswami24
+from helper.thumbnail import thumb_cache, thumb_unique_id
+from helper.templates import caption_template, validate, TemplateError
 
 
 @Client.on_message(filters.private & filters.command("set_caption"))
@@ -9,6 +11,10 @@ async def add_caption(client, message):
             "**Give The Caption\n\nExample :- `/set_caption 📕Name ➠ : {filename} \n\n🔗 Size ➠ : {filesize} \n\n⏰ Duration ➠ : {duration}`**"
         )
     caption = message.text.split(" ", 1)[1]
+    try:
+        validate(caption_template(caption))
+    except TemplateError as e:
+        return await message.reply_text(f"**Invalid caption:** {e}")
     await AshutoshGoswami24.set_caption(message.from_user.id, caption=caption)
     await message.reply_text("**Your Caption Successfully Added ✅**")
 
@@ -42,6 +48,9 @@ async def viewthumb(client, message):
 
 @Client.on_message(filters.private & filters.command(["del_thumb", "delthumb"]))
 async def removethumb(client, message):
+    old_thumb = await AshutoshGoswami24.get_thumbnail(message.from_user.id)
+    if old_thumb:
+        thumb_cache.invalidate(thumb_unique_id(old_thumb))
     await AshutoshGoswami24.set_thumbnail(message.from_user.id, file_id=None)
     await message.reply_text("**Thumbnail Deleted Successfully 🗑️**")
 
@@ -49,6 +58,9 @@ async def removethumb(client, message):
 @Client.on_message(filters.private & filters.photo)
 async def addthumbs(client, message):
     mkn = await message.reply_text("Please Wait ...")
+    old_thumb = await AshutoshGoswami24.get_thumbnail(message.from_user.id)
+    if old_thumb:
+        thumb_cache.invalidate(thumb_unique_id(old_thumb))
     await AshutoshGoswami24.set_thumbnail(
         message.from_user.id, file_id=message.photo.file_id
     )
@@ -1,5 +1,7 @@
 from aiohttp import web
 
+from helper.metrics import render
+
 
 routes = web.RouteTableDef()
 
@@ -8,6 +10,12 @@ async def root_route_handler(request):
     return web.json_response("# -- https://t.me/AshutoshGoswami24 -- ## -- https://github.com/AshutoshGoswami24/Auto-Rename-Bot -- #")
 
 
+@routes.get("/metrics")
+async def metrics_handler(request):
+    body, content_type = render()
+    return web.Response(body=body, headers={"Content-Type": content_type})
+
+
 async def web_server():
     web_app = web.Application(client_max_size=30000000)
     web_app.add_routes(routes)
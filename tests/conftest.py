@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# config.py reads these at import time; the tests never talk to Telegram
+os.environ.setdefault("API_ID", "1")
+os.environ.setdefault("API_HASH", "test")
+os.environ.setdefault("BOT_TOKEN", "1:test")
+os.environ.setdefault("LOG_CHANNEL", "0")
+os.environ.setdefault("PORT", "8080")
+os.environ.setdefault("TRACE_LOG", "")
+# helper.database opens its storage on import; keep it local and offline
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(prefix="autorename-tests-"), "bot.sqlite3"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from pyrogram.errors import FloodWait
+
+from helper.clients import ClientPool
+
+
+class FakeClient:
+    """Stands in for a started pyrogram client; the pool only needs these calls."""
+
+    def __init__(self, name):
+        self.name = name
+        self.is_connected = True
+        self.started = False
+
+    async def start(self):
+        self.started = True
+
+    async def stop(self):
+        self.started = False
+
+    async def get_me(self):
+        return self.name
+
+
+def make_pool(*names, retries=3):
+    pool = ClientPool(relay_chat=-100, retries=retries)
+    primary, *helpers = names
+    pool.add(primary, FakeClient(primary), primary=True)
+    for name in helpers:
+        pool.add(name, FakeClient(name))
+    return pool
+
+
+def session(pool, name):
+    return next(s for s in pool.sessions if s.name == name)
+
+
+def test_pick_least_loaded():
+    pool = make_pool("main", "bot1", "bot2")
+    session(pool, "main").active = 2
+    session(pool, "bot1").active = 1
+    assert pool.pick().name == "bot2"
+    session(pool, "bot2").active = 1
+    session(pool, "bot2").transfers = 5
+    # Equal load: fewer transfers so far wins
+    assert pool.pick().name == "bot1"
+
+
+def test_pick_prefers_main_on_a_tie():
+    pool = make_pool("main", "bot1")
+    assert pool.pick().name == "main"
+
+
+def test_pick_skips_benched_and_unhealthy():
+    pool = make_pool("main", "bot1", "bot2")
+    pool.backoff(session(pool, "bot1"), 60)
+    session(pool, "bot2").healthy = False
+    assert pool.pick().name == "main"
+
+
+def test_run_spreads_concurrent_transfers():
+    pool = make_pool("main", "bot1", "bot2")
+    used = []
+
+    async def transfer(s):
+        used.append(s.name)
+        await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(pool.run(transfer) for _ in range(3)))
+
+    asyncio.run(run())
+    assert sorted(used) == ["bot1", "bot2", "main"]
+    assert all(s.active == 0 for s in pool.sessions)
+
+
+def test_release_on_error():
+    pool = make_pool("main", "bot1")
+    session(pool, "main").transfers = 1
+
+    async def broken(s):
+        raise ConnectionError("gone")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(pool.run(broken))
+    assert all(s.active == 0 for s in pool.sessions)
+    assert session(pool, "bot1").failures == 1
+
+
+def test_flood_wait_moves_to_another_session():
+    pool = make_pool("main", "bot1")
+    session(pool, "main").transfers = 1
+    used = []
+
+    async def transfer(s):
+        used.append(s.name)
+        if s.name == "bot1":
+            raise FloodWait(value=30)
+        return "sent"
+
+    assert asyncio.run(pool.run(transfer)) == "sent"
+    assert used == ["bot1", "main"]
+    assert not session(pool, "bot1").available
+    assert all(s.active == 0 for s in pool.sessions)
+
+
+def test_flood_wait_on_last_attempt_is_raised():
+    pool = make_pool("main", retries=1)
+
+    async def transfer(s):
+        raise FloodWait(value=1)
+
+    with pytest.raises(FloodWait):
+        asyncio.run(pool.run(transfer))
+    assert pool.primary.active == 0
@@ -0,0 +1,47 @@
+import pytest
+
+from helper.filename_parser import extract_file_info
+
+# (name, expected fields)
+CORPUS = [
+    ("Naruto Shippuden S01E05 1080p DUAL.mkv", dict(title="Naruto Shippuden", season="01", episode="05", resolution="1080P", audio="dual")),
+    ("Naruto.Shippuden.S02E15.720p.DUAL.AUDIO.x264-GROUP.mkv", dict(title="Naruto Shippuden", season="02", episode="15", resolution="720P", audio="dual", codec="x264", group="GROUP")),
+    ("Show_S01E05_1080p.mkv", dict(title="Show", season="01", episode="05", resolution="1080P")),
+    ("Show Name S01 EP03 480p.mkv", dict(title="Show Name", season="01", episode="03", resolution="480P")),
+    ("[SubsPlease] Jujutsu Kaisen - 05 (1080p) [ABCD1234].mkv", dict(title="Jujutsu Kaisen", episode="05", resolution="1080P", group="SubsPlease")),
+    ("Attack on Titan 3x12 [4K] HEVC.mp4", dict(title="Attack on Titan", season="3", episode="12", resolution="4K", codec="HEVC")),
+    ("One Piece E1080 [SUB].mkv", dict(title="One Piece", episode="1080", audio="sub")),
+    ("Bleach [05] DUB.mkv", dict(title="Bleach", episode="05", audio="dub")),
+    ("Demon Slayer Episode 7 720p AAC.mp4", dict(title="Demon Slayer", episode="7", resolution="720P", audio_codec="AAC")),
+    ("Movie Name 2019 1080p BluRay x265-RARBG.mp4", dict(title="Movie Name 2019 BluRay", resolution="1080P", codec="x265", group="RARBG")),
+    ("Spider-Man.mkv", dict(title="Spider-Man", episode="1", group="")),
+    ("Some Show - 2019.mkv", dict(title="Some Show - 2019", episode="1")),
+    ("Show S01E02 10bit HEVC.mkv", dict(title="Show", episode="02", codec="HEVC")),
+    ("Show S01E02 HEVC 10bit.mkv", dict(title="Show", episode="02", codec="HEVC")),
+    ("Show S01E02 1080p 10bit.mkv", dict(title="Show", episode="02", codec="10bit")),
+    ("Show.S01E01.1080p.WEB-DL.mkv", dict(title="Show WEB-DL", episode="01", resolution="1080P", group="")),
+    ("Show.S01E01.720p.WEB-Rip.mkv", dict(title="Show WEB-Rip", episode="01", resolution="720P", group="")),
+    ("Show.S01E01.1080p.WEB-DL.x264-GRP.mkv", dict(title="Show WEB-DL", codec="x264", group="GRP")),
+    ("Movie (2019).mkv", dict(title="Movie (2019)")),
+    ("[SubsPlease] Oshi no Ko (2023) - 05 (1080p) [ABCD1234].mkv", dict(title="Oshi no Ko (2023)", episode="05", resolution="1080P", group="SubsPlease")),
+    ("Show (Uncensored) S01E01.mkv", dict(title="Show (Uncensored)", season="01", episode="01")),
+]
+
+
+@pytest.mark.parametrize("name, expected", CORPUS, ids=[name for name, _ in CORPUS])
+def test_corpus(name, expected):
+    info = extract_file_info(name)
+    assert {key: info[key] for key in expected} == expected
+
+
+def test_defaults_without_tokens():
+    assert extract_file_info("Just A Title.mkv") == {
+        "title": "Just A Title",
+        "season": "1",
+        "episode": "1",
+        "resolution": "",
+        "audio": "",
+        "codec": "",
+        "audio_codec": "",
+        "group": "",
+    }
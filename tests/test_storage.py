@@ -0,0 +1,116 @@
+"""SQLiteStorage through create_storage and the Database facade, fully offline.
+
+The bot has no ban list; removing users (``delete_users``, used when a
+broadcast finds users who blocked the bot) is covered instead.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import helper.database as database
+from config import Config
+from helper.database import Database
+from helper.storage import SQLiteStorage, Storage, create_storage
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "DB_BACKEND", "sqlite")
+    monkeypatch.setattr(Config, "SQLITE_PATH", str(tmp_path / "bot.sqlite3"))
+    return create_storage()
+
+
+@pytest.fixture
+def db(storage, monkeypatch):
+    async def send_log(bot, user):
+        pass
+
+    monkeypatch.setattr(database, "send_log", send_log)
+    return Database(storage)
+
+
+def message(user_id):
+    return SimpleNamespace(from_user=SimpleNamespace(id=user_id))
+
+
+def test_create_storage_picks_sqlite(storage):
+    assert isinstance(storage, SQLiteStorage)
+
+
+def test_storage_is_abstract():
+    with pytest.raises(TypeError):
+        Storage()
+
+
+def test_users(storage):
+    async def run():
+        assert await storage.insert_user(1, {"caption": None})
+        assert not await storage.insert_user(1, {"caption": "ignored"})
+        for user_id in (2, 3, 4):
+            await storage.insert_user(user_id, {})
+        assert await storage.count_users() == 4
+        assert await storage.get_user(1, ["caption"]) == {"_id": 1, "caption": None}
+        assert await storage.get_user(99, ["caption"]) is None
+        assert await storage.user_ids_after(None, 2) == [1, 2]
+        assert await storage.user_ids_after(2, 10) == [3, 4]
+        assert [user["_id"] async for user in storage.find_users(3)] == [1, 2, 3, 4]
+        assert await storage.delete_users([2, 3, 99]) == 2
+        assert await storage.user_ids_after(None, 10) == [1, 4]
+
+    asyncio.run(run())
+
+
+def test_set_user_field_only_touches_existing_users(storage):
+    async def run():
+        await storage.insert_user(1, {})
+        assert await storage.set_user_field(1, "caption", "hi")
+        assert not await storage.set_user_field(2, "caption", "hi")
+        assert await storage.get_user(2, ["caption"]) is None
+
+    asyncio.run(run())
+
+
+def test_settings(db):
+    async def run():
+        assert (await db.get_settings(5))["caption"] is None
+        await db.add_user(None, message(5))
+        # The defaults cached before the insert are dropped
+        assert (await db.get_settings(5))["metadata"] is True
+        await db.set_caption(5, "cap")
+        await db.set_format_template(5, "{title} E{episode}")
+        db.invalidate_settings()
+        settings = await db.get_settings(5)
+        assert settings["caption"] == "cap"
+        assert settings["format_template"] == "{title} E{episode}"
+        # Unknown users are not created or cached by a setter
+        await db.set_caption(6, "x")
+        assert (await db.get_settings(6))["caption"] is None
+        assert not await db.is_user_exist(6)
+
+    asyncio.run(run())
+
+
+def test_delete_users(db):
+    async def run():
+        for user_id in (1, 2, 3):
+            await db.add_user(None, message(user_id))
+        assert await db.total_users_count(exact=True) == 3
+        await db.delete_users([1, 2])
+        assert await db.total_users_count(exact=True) == 1
+        assert not await db.is_user_exist(1)
+        assert await db.is_user_exist(3)
+
+    asyncio.run(run())
+
+
+def test_result_cache(db):
+    async def run():
+        assert await db.get_cached_result("k") is None
+        await db.set_cached_result("k", "file-1")
+        await db.set_cached_result("k", "file-2")
+        assert await db.get_cached_result("k") == "file-2"
+        await db.delete_cached_result("k")
+        assert await db.get_cached_result("k") is None
+
+    asyncio.run(run())